@@ -1,6 +1,11 @@
 # app.py
 import pygame
 import os
+import sys
+
+from atlas import SpriteAtlas
+from asset_loader import AssetLoader
+from definitions import load_definitions
 
 # --------------------------------------------------------------------------
 #                               CONSTANTS
@@ -10,7 +15,14 @@ WIDTH = 800
 HEIGHT = 600
 FPS = 60
 
+# Longest real frame the fixed-timestep loop will try to catch up on (seconds)
+MAX_FRAME_TIME = 0.25
+# Step the simulation on a worker thread while the previous tick is drawn
+PIPELINED_SIMULATION = False
+
 PLAYER_SPEED = 3
+# Ticks a fire press waits for the shot cooldown before it is dropped
+FIRE_BUFFER_TICKS = 10
 DEFAULT_ENEMY_SPEED = 1
 
 SPAWN_MARGIN = 50
@@ -20,80 +32,289 @@ PLAYER_SCALE_FACTOR = 2
 FLOOR_TILE_SCALE_FACTOR = 2
 HEALTH_SCALE_FACTOR = 3
 
+# Keep the scaled atlas on disk between runs so startup skips the per-frame
+# load and scale
+PERSIST_ATLAS = False
+ATLAS_CACHE_PATH = os.path.join(".cache", "atlas")
+
+# Decoded and scaled images are cached here as raw pixels. Bump the version
+# whenever the cache format or the scaling step changes.
+ASSET_CACHE = True
+ASSET_CACHE_DIR = os.path.join(".cache", "assets")
+ASSET_CACHE_VERSION = 1
+
 PUSHBACK_DISTANCE = 80
 ENEMY_KNOCKBACK_SPEED = 5
+# Only enemies this close to the player are knocked back when it is hit
+KNOCKBACK_RADIUS = 200
+
+# Balance: ticks between enemy waves, the size of the first wave and how much
+# each level up adds to it, and the XP needed to reach level L + 1
+# (LEVEL_XP_FACTOR * L * L)
+ENEMY_SPAWN_INTERVAL = 60
+ENEMIES_PER_SPAWN = 1
+ENEMIES_PER_SPAWN_GROWTH = 1
+LEVEL_XP_FACTOR = 5
+
+# What each upgrade adds; Shorter Cooldown multiplies the cooldown
+UPGRADE_BULLET_SIZE = 5
+UPGRADE_BULLET_SPEED = 2
+UPGRADE_BULLET_COUNT = 1
+UPGRADE_COOLDOWN_FACTOR = 0.8
+
+# Coins: at most COIN_CAP on the ground (the oldest goes to make room), each
+# lasting COIN_TTL ticks. A coin dropped within COIN_MERGE_RADIUS of another
+# adds its value to that one, which grows from COIN_SIZE to COIN_MAX_SIZE.
+# Coins inside the player's magnet radius (COIN_MAGNET_RADIUS to start, 0 for
+# none) fly towards them at COIN_MAGNET_SPEED pixels per tick.
+COIN_CAP = 200
+COIN_TTL = FPS * 60
+COIN_MERGE_RADIUS = 24
+COIN_SIZE = 15
+COIN_MAX_SIZE = 25
+COIN_MAGNET_RADIUS = 0
+COIN_MAGNET_SPEED = 6
+
+# Power-ups: at most POWERUP_CAP waiting, each lasting POWERUP_TTL ticks
+POWERUP_CAP = 4
+POWERUP_TTL = FPS * 30
+
+# Side length of a spatial hash cell, roughly two sprites wide
+COLLISION_CELL_SIZE = 64
+
+# Size of the world the camera scrolls over; None makes that axis unbounded
+WORLD_WIDTH = 3200
+WORLD_HEIGHT = 2400
+
+# The floor is built from CHUNK_TILES x CHUNK_TILES tile chunks, of which the
+# CHUNK_CACHE_SIZE most recently seen stay rendered
+CHUNK_TILES = 8
+CHUNK_CACHE_SIZE = 32
+
+# Simulation level of detail, by distance outside the camera view (pixels).
+# Enemies within LOD_MID_MARGIN move every OFFSCREEN_UPDATE_INTERVAL ticks and
+# those further out every LOD_FAR_INTERVAL, covering the same distance in one
+# larger step. Past LOD_AGGREGATE_MARGIN they are folded into groups of
+# LOD_GROUP_SIZE pixels that march in as one until they come back within
+# LOD_RELEASE_MARGIN. Only enemies on screen animate.
+OFFSCREEN_UPDATE_INTERVAL = 4
+LOD_MID_MARGIN = 400
+LOD_FAR_INTERVAL = 16
+LOD_AGGREGATE_MARGIN = 1200
+LOD_RELEASE_MARGIN = 800
+LOD_GROUP_SIZE = 256
+
+# Spawn director: waves stop adding enemies once DIRECTOR_CAPACITY
+# are alive (on screen or held far away) and promote them instead. A tier up
+# multiplies hp by PROMOTION_HP_FACTOR and adds PROMOTION_SPEED_BONUS to the
+# speed. At most DIRECTOR_SPAWNS_PER_TICK queued spawns are placed per tick.
+DIRECTOR_CAPACITY = 2000
+DIRECTOR_MIN_CAPACITY = 100
+DIRECTOR_MAX_CAPACITY = 10000
+DIRECTOR_SPAWNS_PER_TICK = 8
+PROMOTION_HP_FACTOR = 2
+PROMOTION_SPEED_BONUS = 0.25
+PROMOTION_MAX_TIER = 4
+# While playing, the capacity follows the measured frame cost: every
+# DIRECTOR_ADJUST_INTERVAL frames the smoothed cost is checked against
+# DIRECTOR_FRAME_BUDGET_MS (most of a frame at FPS, leaving room for the
+# flip). Over budget, the capacity drops to what would fit; under
+# DIRECTOR_HEADROOM of it with most of the capacity in use, it grows by
+# DIRECTOR_GROWTH.
+DIRECTOR_FRAME_BUDGET_MS = 1000 / FPS * 0.8
+DIRECTOR_ADJUST_INTERVAL = FPS
+DIRECTOR_SMOOTHING = 0.1
+DIRECTOR_HEADROOM = 0.75
+DIRECTOR_GROWTH = 1.1
+
+# Enemies within this many flow-field cells of the player seek them directly
+FLOW_FIELD_NEAR = 1.5
+# How hard enemies sharing a cell push apart, in pixels per tick, and the
+# cell size used to find them (about one sprite)
+ENEMY_SEPARATION = 0.6
+SEPARATION_CELL_SIZE = 32
+
+# Frames of history behind the profiler's rolling percentiles, and where
+# session exports are written
+PROFILER_WINDOW = 300
+PROFILE_DIR = "profiles"
+
+# Dirty-rect rendering redraws and presents only the regions sprites touched;
+# past THRESHOLD (fraction of the screen) a full flip is cheaper
+DIRTY_RECT_RENDERING = False
+DIRTY_RECT_THRESHOLD = 0.5
+
+# Where F6 saves and F9 loads the quick snapshot
+SNAPSHOT_PATH = os.path.join("snapshots", "quicksave.snap")
+
+# Rendered text surfaces kept by the HUD before the least recently used is dropped
+TEXT_CACHE_SIZE = 128
+
+# Mixer channels, of which the first MIXER_RESERVED_CHANNELS are kept for
+# high priority sounds
+MIXER_CHANNELS = 8
+MIXER_RESERVED_CHANNELS = 2
+
+# How each sound is mixed: name -> (priority, most copies playing at once).
+# Priority 1 sounds start first and may use the reserved channels.
+SOUND_SETTINGS = {
+    "level_up": (1, 1),
+    "player_damage": (1, 1),
+    "enemy_death": (0, 3),
+    "bullet_sound": (0, 2),
+}
+
+# Enemy types, upgrades and power-ups, validated and compiled at startup.
+# Values in the file may name any constant above.
+DEFINITIONS_PATH = "definitions.json"
+DEFINITIONS = load_definitions(DEFINITIONS_PATH, sys.modules[__name__])
+
+# Sprite sheets packed into the atlas: name -> (file prefix, frames, scale)
+ATLAS_SHEETS = {
+    **{enemy.name: (enemy.sprite, enemy.frames, enemy.scale) for enemy in DEFINITIONS.enemies.values()},
+    "player_idle": ("player_idle", 4, PLAYER_SCALE_FACTOR),
+    "player_run":  ("player_run",  4, PLAYER_SCALE_FACTOR),
+}
 
 # --------------------------------------------------------------------------
 #                       ASSET LOADING FUNCTIONS
 # --------------------------------------------------------------------------
 
-def load_frames(prefix, frame_count, scale_factor=1, folder="assets"):
-    frames = []
-    for i in range(frame_count):
-        image_path = os.path.join(folder, f"{prefix}_{i}.png")
-        img = pygame.image.load(image_path).convert_alpha()
+# headless=True skips convert()/convert_alpha(), which need a display mode,
+# and skips audio so the simulation can load on a machine with neither.
+#
+# Every file is read through an AssetLoader, which decodes and scales on a
+# thread pool and caches the scaled pixels on disk. start_loading() queues
+# the whole manifest up front so a loading screen can run while it works;
+# load_assets() then only collects results.
+
+SOUND_FILES = {
+    "level_up": "Level up.wav",
+    "player_damage": "Player Damage.wav",
+    "enemy_death": "Enemy Death.wav",
+    "bullet_sound": "Bullet Sound.wav",
+}
+
+POWERUP_FILES = {name: powerup.image for name, powerup in DEFINITIONS.powerups.items()}
 
-        if scale_factor != 1:
-            w = img.get_width() * scale_factor
-            h = img.get_height() * scale_factor
-            img = pygame.transform.scale(img, (w, h))
+def create_loader():
+    return AssetLoader(ASSET_CACHE_DIR if ASSET_CACHE else None, version=ASSET_CACHE_VERSION)
 
+def frame_paths(prefix, frame_count, folder="assets"):
+    return [os.path.join(folder, f"{prefix}_{i}.png") for i in range(frame_count)]
+
+def start_loading(headless=False, loader=None):
+    loader = loader or create_loader()
+    for prefix, frame_count, scale_factor in ATLAS_SHEETS.values():
+        for path in frame_paths(prefix, frame_count):
+            loader.request_image(path, scale_factor)
+    for path in frame_paths("floor", 8):
+        loader.request_image(path, FLOOR_TILE_SCALE_FACTOR)
+    for path in frame_paths("health", 6):
+        loader.request_image(path, HEALTH_SCALE_FACTOR)
+    for filename in POWERUP_FILES.values():
+        loader.request_image(os.path.join("assets", filename))
+    if not headless:
+        for filename in SOUND_FILES.values():
+            loader.request_sound(os.path.join("assets", filename))
+    return loader
+
+def load_frames(prefix, frame_count, scale_factor=1, folder="assets", headless=False, loader=None):
+    loader = loader or create_loader()
+    frames = []
+    for image_path in frame_paths(prefix, frame_count, folder):
+        img = loader.image(image_path, scale_factor)
+        if not headless:
+            img = img.convert_alpha()
         frames.append(img)
     return frames
 
-def load_floor_tiles(folder="assets"):
+def load_floor_tiles(folder="assets", headless=False, loader=None):
+    loader = loader or create_loader()
     floor_tiles = []
-    for i in range(8):
-        path = os.path.join(folder, f"floor_{i}.png")
-        tile = pygame.image.load(path).convert()
-
-        if FLOOR_TILE_SCALE_FACTOR != 1:
-            tw = tile.get_width() * FLOOR_TILE_SCALE_FACTOR
-            th = tile.get_height() * FLOOR_TILE_SCALE_FACTOR
-            tile = pygame.transform.scale(tile, (tw, th))
-
+    for path in frame_paths("floor", 8, folder):
+        tile = loader.image(path, FLOOR_TILE_SCALE_FACTOR)
+        if not headless:
+            tile = tile.convert()
         floor_tiles.append(tile)
     return floor_tiles
 
-def load_assets():
+def atlas_cache_key(folder="assets"):
+    # Identifies the exact sources and scales an atlas was built from
+    parts = []
+    for name, (prefix, frame_count, scale_factor) in ATLAS_SHEETS.items():
+        for i in range(frame_count):
+            stat = os.stat(os.path.join(folder, f"{prefix}_{i}.png"))
+            parts.append(f"{prefix}_{i}:{stat.st_size}:{stat.st_mtime_ns}:{scale_factor}")
+    return "|".join(parts)
+
+def load_atlas(headless=False, persist=PERSIST_ATLAS, loader=None):
+    key = atlas_cache_key() if persist else None
+    if persist:
+        atlas = SpriteAtlas.load(ATLAS_CACHE_PATH, key, headless)
+        if atlas is not None:
+            return atlas
+
+    sheets = {
+        name: load_frames(prefix, frame_count, scale_factor=scale_factor, headless=True, loader=loader)
+        for name, (prefix, frame_count, scale_factor) in ATLAS_SHEETS.items()
+    }
+    atlas = SpriteAtlas(sheets)
+    if persist:
+        atlas.save(ATLAS_CACHE_PATH, key)
+    return atlas if headless else atlas.convert()
+
+def load_image(path, headless=False, loader=None):
+    img = (loader or create_loader()).image(path)
+    return img if headless else img.convert_alpha()
+
+def load_assets(headless=False, loader=None):
+    own_loader = loader is None
+    if own_loader:
+        loader = start_loading(headless)
     assets = {}
 
+    # Enemy and player frames, with their mirrored copies, live in one atlas
+    atlas = load_atlas(headless, loader=loader)
+    assets["atlas"] = atlas
+
     # Enemies
-    assets["enemies"] = {
-        "orc":    load_frames("orc",    4, scale_factor=ENEMY_SCALE_FACTOR),
-        "undead": load_frames("undead", 4, scale_factor=ENEMY_SCALE_FACTOR),
-        "demon":  load_frames("demon",  4, scale_factor=ENEMY_SCALE_FACTOR),
-    }
+    assets["definitions"] = DEFINITIONS
+    assets["enemies"] = {name: atlas.frames(name) for name in DEFINITIONS.enemy_names}
 
     # Player
     assets["player"] = {
-        "idle": load_frames("player_idle", 4, scale_factor=PLAYER_SCALE_FACTOR),
-        "run":  load_frames("player_run",  4, scale_factor=PLAYER_SCALE_FACTOR),
+        "idle": atlas.frames("player_idle"),
+        "run":  atlas.frames("player_run"),
     }
 
     # Floor tiles
-    assets["floor_tiles"] = load_floor_tiles()
+    assets["floor_tiles"] = load_floor_tiles(headless=headless, loader=loader)
 
     # Health images
-    assets["health"] = load_frames("health", 6, scale_factor=HEALTH_SCALE_FACTOR)
+    assets["health"] = load_frames("health", 6, scale_factor=HEALTH_SCALE_FACTOR, headless=headless, loader=loader)
 
     # Example coin image (uncomment if you have coin frames / images)
     # assets["coin"] = pygame.image.load(os.path.join("assets", "coin.png")).convert_alpha()
 
     assets["powerups"] = {
-        "health": pygame.image.load(os.path.join("assets", "Health.png")).convert_alpha(),
-        "speed": pygame.image.load(os.path.join("assets", "Speed.png")).convert_alpha(),
-        "shield": pygame.image.load(os.path.join("assets", "Shield.png")).convert_alpha(),
+        name: load_image(os.path.join("assets", filename), headless, loader)
+        for name, filename in POWERUP_FILES.items()
     }
 
-    assets["sounds"] = {
-        "background_music": pygame.mixer.music.load(os.path.join("assets", "Background Music.wav")),
-        "level_up": pygame.mixer.Sound(os.path.join("assets", "Level up.wav")),
-        "player_damage": pygame.mixer.Sound(os.path.join("assets", "Player Damage.wav")),
-        "enemy_death": pygame.mixer.Sound(os.path.join("assets", "Enemy Death.wav")),
-        "bullet_sound": pygame.mixer.Sound(os.path.join("assets", "Bullet Sound.wav")),
-    }    
-
-    return assets
+    if headless:
+        assets["music"] = None
+        assets["sounds"] = {}
+    else:
+        # The music track is optional; the game runs silently without it
+        music_path = os.path.join("assets", "Background Music.wav")
+        assets["music"] = music_path if os.path.exists(music_path) else None
 
+        assets["sounds"] = {
+            name: loader.sound(os.path.join("assets", filename))
+            for name, filename in SOUND_FILES.items()
+        }
 
+    if own_loader:
+        loader.close()
+    return assets
@@ -0,0 +1,117 @@
+# asset_loader.py
+import concurrent.futures
+import hashlib
+import io
+import mmap
+import os
+import struct
+import threading
+
+import pygame
+
+CACHE_MAGIC = b"PXC1"
+CACHE_HEADER = struct.Struct("<4sII")  # magic, width, height
+
+
+# Decodes and scales images on a thread pool while the main thread keeps
+# drawing a loading screen. Scaled pixels are cached on disk as raw RGBA,
+# keyed by the source file's hash and the scale factor, and mapped straight
+# back into surfaces on the next start.
+#
+# Results are plain surfaces; convert()/convert_alpha() still has to happen on
+# the main thread once a display mode exists.
+class AssetLoader:
+    def __init__(self, cache_dir=None, version=1, workers=None):
+        # cache_dir=None disables the disk cache
+        use_cache = cache_dir is not None
+        self.cache_dir = os.path.join(cache_dir, f"v{version}") if use_cache else None
+        self.use_cache = use_cache
+        if use_cache:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+        self.jobs = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def request_image(self, path, scale=1):
+        key = ("image", path, scale)
+        if key not in self.jobs:
+            self.jobs[key] = self.pool.submit(self.decode_image, path, scale)
+        return self.jobs[key]
+
+    def request_sound(self, path):
+        key = ("sound", path)
+        if key not in self.jobs:
+            self.jobs[key] = self.pool.submit(pygame.mixer.Sound, path)
+        return self.jobs[key]
+
+    def image(self, path, scale=1):
+        return self.request_image(path, scale).result()
+
+    def sound(self, path):
+        return self.request_sound(path).result()
+
+    def progress(self):
+        # (finished jobs, all jobs), for the loading bar
+        done = sum(1 for job in self.jobs.values() if job.done())
+        return done, len(self.jobs)
+
+    def done(self):
+        return all(job.done() for job in self.jobs.values())
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def decode_image(self, path, scale):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        cache_path = None
+        if self.use_cache:
+            digest = hashlib.sha1(data).hexdigest()
+            cache_path = os.path.join(self.cache_dir, f"{digest}_x{scale}.rgba")
+            img = self.read_cached(cache_path)
+            if img is not None:
+                self.cache_hits += 1
+                return img
+        self.cache_misses += 1
+
+        img = pygame.image.load(io.BytesIO(data), path)
+        if scale != 1:
+            w = img.get_width() * scale
+            h = img.get_height() * scale
+            img = pygame.transform.scale(img, (w, h))
+
+        if cache_path is not None:
+            self.write_cached(cache_path, img)
+        return img
+
+    def read_cached(self, cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(mapped) < CACHE_HEADER.size:
+            return None
+        magic, w, h = CACHE_HEADER.unpack_from(mapped)
+        if magic != CACHE_MAGIC or len(mapped) != CACHE_HEADER.size + w * h * 4:
+            return None
+        # The surface keeps a reference to the mapping, so the pixels are
+        # paged in from the OS file cache rather than copied up front
+        return pygame.image.frombuffer(memoryview(mapped)[CACHE_HEADER.size:], (w, h), "RGBA")
+
+    def write_cached(self, cache_path, img):
+        w, h = img.get_size()
+        pixels = pygame.image.tostring(img, "RGBA")
+        # Write to a temporary name first so a crash never leaves a torn entry
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(CACHE_HEADER.pack(CACHE_MAGIC, w, h))
+                f.write(pixels)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
@@ -0,0 +1,91 @@
+# atlas.py
+import json
+import os
+
+import pygame
+
+ATLAS_VERSION = 1
+
+
+# All animation frames packed into one surface, one row per sheet: the frames
+# as loaded followed by their mirrored copies. Draw code looks frames up by
+# (sheet, frame, facing_left) and never flips at runtime.
+class SpriteAtlas:
+    def __init__(self, sheets=None, surface=None, regions=None):
+        if sheets is not None:
+            surface, regions = self.pack(sheets)
+        self.surface = surface
+        self.regions = regions
+        self.images = {}
+        self.build_images()
+
+        self.frame_counts = {}
+        for name, frame, _ in regions:
+            self.frame_counts[name] = max(self.frame_counts.get(name, 0), frame + 1)
+
+    @staticmethod
+    def pack(sheets):
+        width = max(sum(f.get_width() for f in frames) * 2 for frames in sheets.values())
+        height = sum(max(f.get_height() for f in frames) for frames in sheets.values())
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 0))
+
+        regions = {}
+        y = 0
+        for name, frames in sheets.items():
+            x = 0
+            for facing_left in (False, True):
+                for i, frame in enumerate(frames):
+                    image = pygame.transform.flip(frame, True, False) if facing_left else frame
+                    surface.blit(image, (x, y))
+                    regions[(name, i, facing_left)] = pygame.Rect(x, y, frame.get_width(), frame.get_height())
+                    x += frame.get_width()
+            y += max(f.get_height() for f in frames)
+        return surface, regions
+
+    def build_images(self):
+        self.images = {key: self.surface.subsurface(rect) for key, rect in self.regions.items()}
+
+    def convert(self):
+        # Match the display's pixel format; needs a display mode to be set
+        self.surface = self.surface.convert_alpha()
+        self.build_images()
+        return self
+
+    def get(self, name, frame, facing_left=False):
+        return self.images[(name, frame, facing_left)]
+
+    def frames(self, name, facing_left=False):
+        return [self.images[(name, i, facing_left)] for i in range(self.frame_counts[name])]
+
+    def save(self, path, key):
+        # <path>.png holds the pixels, <path>.json the regions and the key
+        # describing the sources, so a stale atlas is never loaded
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        pygame.image.save(self.surface, path + ".png")
+        meta = {
+            "version": ATLAS_VERSION,
+            "key": key,
+            "regions": [[name, frame, facing_left, list(rect)]
+                        for (name, frame, facing_left), rect in self.regions.items()],
+        }
+        with open(path + ".json", "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, key, headless=False):
+        try:
+            with open(path + ".json") as f:
+                meta = json.load(f)
+            if meta.get("version") != ATLAS_VERSION or meta.get("key") != key:
+                return None
+            surface = pygame.image.load(path + ".png")
+        except (OSError, ValueError, pygame.error):
+            return None
+
+        regions = {(name, frame, facing_left): pygame.Rect(rect)
+                   for name, frame, facing_left, rect in meta["regions"]}
+        atlas = cls(surface=surface, regions=regions)
+        return atlas if headless else atlas.convert()
@@ -0,0 +1,90 @@
+# audio.py
+import pygame
+
+import app
+import events
+
+# Sound played for each kind of simulation event
+SOUND_EVENTS = {
+    events.SHOT_FIRED: "bullet_sound",
+    events.PLAYER_HIT: "player_damage",
+    events.ENEMY_KILLED: "enemy_death",
+    events.LEVEL_UP: "level_up",
+}
+
+
+# Plays the game's sounds on a fixed set of mixer channels. Sounds asked for
+# during a frame are only collected; flush() starts them together, so a
+# sound requested many times in one frame starts once. A sound already
+# playing SOUND_SETTINGS' voice limit times is skipped, and high priority
+# sounds go first and have reserved channels ordinary ones can never take.
+class Mixer:
+    def __init__(self, sounds, settings=app.SOUND_SETTINGS, channels=app.MIXER_CHANNELS,
+                 reserved=app.MIXER_RESERVED_CHANNELS):
+        self.sounds = sounds
+        self.settings = settings
+        # find_channel() ignores reservations, so free channels are looked up
+        # here; set_reserved() still keeps plain Sound.play() calls off them
+        pygame.mixer.set_num_channels(channels)
+        pygame.mixer.set_reserved(reserved)
+        self.reserved = [pygame.mixer.Channel(i) for i in range(reserved)]
+        self.shared = [pygame.mixer.Channel(i) for i in range(reserved, channels)]
+        # Requested sound names in request order, used as an ordered set
+        self.pending = {}
+
+    def bind(self, bus, sound_events=SOUND_EVENTS):
+        # Request each event kind's sound whenever the bus delivers a batch
+        for kind, name in sound_events.items():
+            bus.subscribe(kind, lambda batch, name=name: self.request(name))
+
+    def request(self, name):
+        self.pending[name] = None
+
+    def flush(self):
+        # Start this frame's sounds, highest priority first
+        names = sorted(self.pending, key=lambda name: -self.settings[name][0])
+        self.pending.clear()
+        for name in names:
+            self.start(name)
+
+    def start(self, name):
+        sound = self.sounds[name]
+        priority, voices = self.settings[name]
+        if sound.get_num_channels() >= voices:
+            return False
+        # Never steals a channel: with every one busy the sound is dropped
+        channels = self.reserved + self.shared if priority > 0 else self.shared
+        channel = next((c for c in channels if not c.get_busy()), None)
+        if channel is None:
+            return False
+        channel.play(sound)
+        return True
+
+    def play_music(self, path):
+        # The music track is optional; the game runs silently without it
+        if path is None:
+            return
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.play(-1)  # -1 means loop forever
+
+
+# Stands in for Mixer with audio off or unavailable (headless runs, --mute,
+# no audio device): same interface, no sound
+class NullMixer:
+    def bind(self, bus, sound_events=SOUND_EVENTS):
+        pass
+
+    def request(self, name):
+        pass
+
+    def flush(self):
+        pass
+
+    def play_music(self, path):
+        pass
+
+
+def create_mixer(sounds, enabled=True):
+    if not enabled or not sounds or pygame.mixer.get_init() is None:
+        return NullMixer()
+    return Mixer(sounds)
@@ -0,0 +1,235 @@
+# balancer.py
+#
+# Runs many seeded headless games across every core and reports how long a
+# bot survives under each set of balance constants:
+#
+#   python balancer.py                                          # current constants
+#   python balancer.py --games 400 --sweep LEVEL_XP_FACTOR=3,5,8
+#   python balancer.py --sweep ENEMY_SPAWN_INTERVAL=40,60 --set UPGRADE_BULLET_COUNT=2
+#
+# Every combination of the swept values plays the same seeds, so differences
+# between rows come from the constants and not from luck.
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+import app
+from simulation import Simulation, TickInput, HeldKeys
+
+# Constants the simulation reads while it runs, so they can be changed per game
+TUNABLE = (
+    "ENEMY_SPAWN_INTERVAL", "ENEMIES_PER_SPAWN", "ENEMIES_PER_SPAWN_GROWTH", "LEVEL_XP_FACTOR",
+    "UPGRADE_BULLET_SIZE", "UPGRADE_BULLET_SPEED", "UPGRADE_BULLET_COUNT", "UPGRADE_COOLDOWN_FACTOR",
+    "PLAYER_SPEED", "DEFAULT_ENEMY_SPEED", "PUSHBACK_DISTANCE", "KNOCKBACK_RADIUS",
+    "DIRECTOR_CAPACITY", "DIRECTOR_SPAWNS_PER_TICK", "PROMOTION_HP_FACTOR", "PROMOTION_SPEED_BONUS",
+    "PROMOTION_MAX_TIER",
+)
+DEFAULTS = {name: getattr(app, name) for name in TUNABLE}
+
+EDGE_MARGIN = 100   # how close to a wall the bot starts steering back to the centre
+
+# Headless assets, loaded once per worker process
+_assets = None
+
+
+def init_worker():
+    # No pygame.init(): headless loading doesn't need it, and SDL's signal
+    # handlers would stop the pool from terminating workers
+    global _assets
+    _assets = app.load_assets(headless=True)
+
+
+# Runs from the nearest enemy, turning back towards the centre near the walls,
+# and holds the fire button down. Upgrades are picked at random.
+class KiteBot:
+    def __init__(self, rng):
+        self.rng = rng
+
+    def __call__(self, sim):
+        if sim.in_level_up_menu:
+            return TickInput(upgrade=self.rng.randrange(len(sim.upgrade_options)))
+
+        player = sim.player
+        dx = dy = 0.0
+        enemy = sim.find_nearest_enemy()
+        if enemy is not None:
+            dx = player.x - enemy.x
+            dy = player.y - enemy.y
+        width, height = app.WORLD_WIDTH, app.WORLD_HEIGHT
+        if width is not None and (player.x < EDGE_MARGIN or player.x > width - EDGE_MARGIN):
+            dx += width / 2 - player.x
+        if height is not None and (player.y < EDGE_MARGIN or player.y > height - EDGE_MARGIN):
+            dy += height / 2 - player.y
+
+        keys = []
+        if dx < -1:
+            keys.append(pygame.K_LEFT)
+        elif dx > 1:
+            keys.append(pygame.K_RIGHT)
+        if dy < -1:
+            keys.append(pygame.K_UP)
+        elif dy > 1:
+            keys.append(pygame.K_DOWN)
+        return TickInput(HeldKeys(keys), trigger=True)
+
+
+# Stands in the middle of the arena and only shoots
+class TurretBot(KiteBot):
+    def __call__(self, sim):
+        if sim.in_level_up_menu:
+            return TickInput(upgrade=self.rng.randrange(len(sim.upgrade_options)))
+        return TickInput(trigger=True)
+
+
+BOTS = {"kite": KiteBot, "turret": TurretBot}
+
+
+def play(job):
+    # One game in a worker process: returns its survival, XP and cost figures
+    overrides, seed, ticks, bot_name = job
+    for name, value in {**DEFAULTS, **overrides}.items():
+        setattr(app, name, value)
+
+    sim = Simulation(_assets, seed=seed)
+    bot = BOTS[bot_name](random.Random(seed))
+    tick_ms = []
+    peak_enemies = peak_bullets = peak_coins = 0
+    while sim.tick < ticks and not sim.game_over:
+        tick_input = bot(sim)
+        start = time.perf_counter()
+        sim.advance(tick_input)
+        tick_ms.append((time.perf_counter() - start) * 1000)
+        peak_enemies = max(peak_enemies, sim.live_enemies())
+        peak_bullets = max(peak_bullets, len(sim.player.bullets))
+        peak_coins = max(peak_coins, len(sim.coins))
+
+    minutes = sim.tick / app.FPS / 60
+    return {
+        "overrides": overrides,
+        "seed": seed,
+        "survived_s": sim.tick / app.FPS,
+        "died": sim.game_over,
+        "level": sim.player.level,
+        "xp_per_min": sim.player.xp / minutes if minutes else 0.0,
+        "peak_enemies": peak_enemies,
+        "peak_bullets": peak_bullets,
+        "peak_coins": peak_coins,
+        "tick_ms": float(np.mean(tick_ms)) if tick_ms else 0.0,
+        "tick_p95_ms": float(np.percentile(tick_ms, 95)) if tick_ms else 0.0,
+    }
+
+
+def parse_assignment(text):
+    # NAME=1,2,3 -> ("NAME", [1, 2, 3])
+    name, _, values = text.partition("=")
+    name = name.strip().upper()
+    if name not in TUNABLE:
+        raise argparse.ArgumentTypeError(f"{name} is not tunable; choose from {', '.join(TUNABLE)}")
+    try:
+        return name, [json.loads(v) for v in values.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad value list in {text!r}")
+
+
+def build_combos(fixed, sweeps):
+    names = [name for name, _ in sweeps]
+    combos = []
+    for values in itertools.product(*(values for _, values in sweeps)):
+        overrides = {name: values[0] for name, values in fixed}
+        overrides.update(zip(names, values))
+        combos.append(overrides)
+    return combos
+
+
+def summarize(results):
+    # Mean (and spread where useful) of every metric, per combination
+    groups = {}
+    for result in results:
+        key = json.dumps(result["overrides"], sort_keys=True)
+        groups.setdefault(key, []).append(result)
+
+    report = []
+    for key, games in groups.items():
+        survived = np.array([g["survived_s"] for g in games])
+        report.append({
+            "overrides": json.loads(key),
+            "games": len(games),
+            "deaths": sum(g["died"] for g in games),
+            "survived_s_mean": float(survived.mean()),
+            "survived_s_p10": float(np.percentile(survived, 10)),
+            "survived_s_p90": float(np.percentile(survived, 90)),
+            "level_mean": float(np.mean([g["level"] for g in games])),
+            "xp_per_min_mean": float(np.mean([g["xp_per_min"] for g in games])),
+            "peak_enemies_max": max(g["peak_enemies"] for g in games),
+            "peak_bullets_max": max(g["peak_bullets"] for g in games),
+            "peak_coins_max": max(g["peak_coins"] for g in games),
+            "tick_ms_mean": float(np.mean([g["tick_ms"] for g in games])),
+            "tick_p95_ms_max": max(g["tick_p95_ms"] for g in games),
+        })
+    report.sort(key=lambda row: json.dumps(row["overrides"], sort_keys=True))
+    return report
+
+
+def print_report(report):
+    print(f"{'overrides':<40}{'games':>6}{'deaths':>7}{'survive s':>10}{'p10':>7}{'p90':>7}"
+          f"{'level':>7}{'xp/min':>8}{'enemies':>8}{'tick ms':>8}{'p95 ms':>8}")
+    for row in report:
+        label = " ".join(f"{k}={v}" for k, v in row["overrides"].items()) or "(defaults)"
+        print(f"{label:<40}{row['games']:>6}{row['deaths']:>7}{row['survived_s_mean']:>10.1f}"
+              f"{row['survived_s_p10']:>7.1f}{row['survived_s_p90']:>7.1f}{row['level_mean']:>7.2f}"
+              f"{row['xp_per_min_mean']:>8.1f}{row['peak_enemies_max']:>8}{row['tick_ms_mean']:>8.3f}"
+              f"{row['tick_p95_ms_max']:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch balance sweeps over headless games")
+    parser.add_argument("--games", type=int, default=100, help="games per combination")
+    parser.add_argument("--ticks", type=int, default=app.FPS * 60 * 5, help="tick limit per game")
+    parser.add_argument("--seed", type=int, default=0, help="first seed; game i plays seed + i")
+    parser.add_argument("--bot", choices=sorted(BOTS), default="kite", help="player policy")
+    parser.add_argument("--set", type=parse_assignment, action="append", default=[], metavar="NAME=VALUE",
+                        help="override a constant for every game")
+    parser.add_argument("--sweep", type=parse_assignment, action="append", default=[], metavar="NAME=V1,V2",
+                        help="try every listed value (combined with other sweeps)")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: every core)")
+    parser.add_argument("--output", help="also write the report (and every game) as JSON")
+    args = parser.parse_args()
+
+    combos = build_combos(args.set, args.sweep)
+    jobs = [(overrides, args.seed + i, args.ticks, args.bot)
+            for overrides in combos for i in range(args.games)]
+    processes = args.processes or os.cpu_count()
+    print(f"{len(jobs)} games ({len(combos)} combinations x {args.games}) on {processes} processes")
+
+    start = time.perf_counter()
+    results = []
+    with multiprocessing.Pool(processes, initializer=init_worker) as pool:
+        chunksize = max(1, math.ceil(len(jobs) / (processes * 8)))
+        for result in pool.imap_unordered(play, jobs, chunksize):
+            results.append(result)
+        pool.close()
+        pool.join()
+    elapsed = time.perf_counter() - start
+    print(f"Finished in {elapsed:.1f}s")
+
+    report = summarize(results)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"report": report, "games": results}, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
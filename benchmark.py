@@ -0,0 +1,241 @@
+# benchmark.py
+#
+# Reproducible performance sweep over scripted game states:
+#
+#   python benchmark.py                      # run and compare against the baseline
+#   python benchmark.py --save-baseline      # record this machine's numbers
+#   python benchmark.py --enemies 100,1000 --bullets 0,500 --ticks 60
+#
+# Every scenario is seeded, drives the simulation with scripted input and
+# renders through the real Game.draw path on SDL's dummy video driver.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import app
+from game import Game
+from profiler import FrameProfiler
+from simulation import HeldKeys, Simulation
+
+BASELINE_PATH = "benchmark_baseline.json"
+
+# Held keys cycle through these so the player keeps moving around the arena
+SCRIPT = [
+    (pygame.K_LEFT,), (pygame.K_LEFT, pygame.K_UP), (pygame.K_UP,), (pygame.K_RIGHT, pygame.K_UP),
+    (pygame.K_RIGHT,), (pygame.K_RIGHT, pygame.K_DOWN), (pygame.K_DOWN,), (pygame.K_LEFT, pygame.K_DOWN),
+]
+SCRIPT_STEP = 20  # ticks per script entry
+
+# Metrics compared against the baseline; higher_is_better decides the direction
+CHECKED = {
+    "ticks_per_sec": True,
+    "tick_ms": False,
+    "draw_ms": False,
+    "bullet_hits_ms": False,
+    "find_nearest_us": False,
+    "spawn_ms": False,
+}
+
+
+def scripted_keys(tick):
+    return HeldKeys(SCRIPT[(tick // SCRIPT_STEP) % len(SCRIPT)])
+
+
+def top_up_enemies(sim, count, rng):
+    # Keep the horde at the scenario size, spawning on a ring around the player
+    types = list(sim.assets["enemies"].keys())
+    while len(sim.enemies) < count:
+        x = sim.player.x + rng.uniform(-app.WIDTH, app.WIDTH)
+        y = sim.player.y + rng.uniform(-app.HEIGHT, app.HEIGHT)
+        sim.enemies.spawn(x, y, rng.choice(types))
+
+
+def top_up_bullets(sim, count, rng):
+    player = sim.player
+    while len(player.bullets) < count:
+        view = sim.camera.rect
+        x = rng.uniform(view.left, view.right)
+        y = rng.uniform(view.top, view.bottom)
+        vx = rng.uniform(-1, 1) * player.bullet_speed
+        vy = rng.uniform(-1, 1) * player.bullet_speed
+        player.bullets.spawn(x, y, vx, vy, player.bullet_size)
+
+
+def make_scenario(game, enemy_count, bullet_count, seed):
+    random.seed(seed)
+    rng = random.Random(seed)
+    profiler = FrameProfiler(window=100000)
+    game.profiler = profiler
+    game.sim = Simulation(game.assets, seed=seed, profiler=profiler)
+    # The benchmark measures cost, not survival
+    game.sim.player.health = game.sim.player.max_health = 10**9
+    top_up_enemies(game.sim, enemy_count, rng)
+    top_up_bullets(game.sim, bullet_count, rng)
+    return rng
+
+
+def run_ticks(game, enemy_count, bullet_count, ticks, rng, draw=True):
+    sim = game.sim
+    step_time = 0.0
+    for tick in range(ticks):
+        top_up_enemies(sim, enemy_count, rng)
+        top_up_bullets(sim, bullet_count, rng)
+        if sim.in_level_up_menu:
+            sim.choose_upgrade(0)
+
+        game.profiler.begin_frame()
+        start = time.perf_counter()
+        sim.step(scripted_keys(tick))
+        step_time += time.perf_counter() - start
+
+        if draw:
+            with game.profiler.stage("draw"):
+                game.draw()
+        game.profiler.end_frame()
+    return step_time
+
+
+def time_find_nearest(sim, calls=200):
+    start = time.perf_counter()
+    for _ in range(calls):
+        sim.find_nearest_enemy()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def time_spawn(sim, batch=50, calls=20):
+    # Force a full spawn wave each call, planned by the director and placed
+    # through place_enemy (just outside the view, so always into the pool),
+    # then drop the new enemies again. The director is given room for the
+    # wave so large scenarios don't plan an empty one.
+    saved = sim.enemies_per_spawn, sim.director.capacity
+    sim.enemies_per_spawn = batch
+    total = 0.0
+    for _ in range(calls):
+        before = len(sim.enemies)
+        sim.director.capacity = sim.live_enemies() + batch
+        sim.enemy_spawn_timer = sim.enemy_spawn_interval
+        start = time.perf_counter()
+        sim.spawn_enemies()
+        while sim.director:
+            sim.place_spawns()
+        total += time.perf_counter() - start
+        for enemy in list(sim.enemies)[before:]:
+            sim.enemy_grid.remove(enemy)
+            sim.enemies.remove(enemy)
+    sim.director.clear()
+    sim.enemies_per_spawn, sim.director.capacity = saved
+    return total / calls * 1000
+
+
+def run_scenario(game, enemy_count, bullet_count, ticks, seed):
+    rng = make_scenario(game, enemy_count, bullet_count, seed)
+    step_time = run_ticks(game, enemy_count, bullet_count, ticks, rng)
+    profiler = game.profiler
+
+    result = {
+        "ticks_per_sec": ticks / step_time if step_time else 0.0,
+        "tick_ms": step_time / ticks * 1000,
+        "draw_ms": profiler.percentiles("draw")[0],
+        "find_nearest_us": time_find_nearest(game.sim),
+        "spawn_ms": time_spawn(game.sim),
+        "stages": {name: round(profiler.percentiles(name)[0], 4)
+                   for name in profiler.samples if name != "frame"},
+    }
+    result["bullet_hits_ms"] = result["stages"].get("bullet_hits", 0.0)
+
+    # Peak memory comes from a separate, shorter pass since tracemalloc
+    # slows everything it watches
+    rng = make_scenario(game, enemy_count, bullet_count, seed)
+    tracemalloc.start()
+    run_ticks(game, enemy_count, bullet_count, max(1, ticks // 4), rng, draw=False)
+    result["peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return result
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        for metric, higher_is_better in CHECKED.items():
+            old = expected.get(metric)
+            new = result.get(metric)
+            if not old or new is None:
+                continue
+            if higher_is_better and new < old * (1 - tolerance):
+                regressions.append(f"{key} {metric}: {new:.3f} < baseline {old:.3f}")
+            elif not higher_is_better and new > old * (1 + tolerance):
+                regressions.append(f"{key} {metric}: {new:.3f} > baseline {old:.3f}")
+    return regressions
+
+
+def parse_counts(text):
+    return [int(part) for part in text.split(",") if part]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shooter performance benchmark")
+    parser.add_argument("--enemies", type=parse_counts, default=[100, 1000, 10000])
+    parser.add_argument("--bullets", type=parse_counts, default=[0, 100, 1000])
+    parser.add_argument("--ticks", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed fractional slowdown before a metric counts as a regression")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    game = Game()
+
+    results = {}
+    print(f"{'scenario':<14}{'ticks/s':>10}{'tick ms':>10}{'draw ms':>10}"
+          f"{'hits ms':>10}{'nearest us':>12}{'spawn ms':>10}{'peak KB':>10}")
+    for enemy_count in args.enemies:
+        for bullet_count in args.bullets:
+            key = f"e{enemy_count}_b{bullet_count}"
+            r = run_scenario(game, enemy_count, bullet_count, args.ticks, args.seed)
+            results[key] = r
+            print(f"{key:<14}{r['ticks_per_sec']:>10.0f}{r['tick_ms']:>10.3f}{r['draw_ms']:>10.3f}"
+                  f"{r['bullet_hits_ms']:>10.3f}{r['find_nearest_us']:>12.1f}{r['spawn_ms']:>10.3f}"
+                  f"{r['peak_kb']:>10.0f}")
+    pygame.quit()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print("REGRESSION", line)
+    if not regressions:
+        print("No regressions against baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,92 @@
 import app
+from render_queue import LAYER_BULLETS, sprite_image
+
+# Bullets of the same size look identical, so they share one surface per size
+_bullet_images = {}
+
+def get_bullet_image(size):
+    image = _bullet_images.get(size)
+    if image is None:
+        image = app.pygame.Surface((size, size), app.pygame.SRCALPHA)
+        image.fill((255, 255, 255))
+        image = _bullet_images[size] = sprite_image(image)
+    return image
+
 
 class Bullet:
-    def __init__(self, x, y, vx, vy, size):
+    __slots__ = ("x", "y", "vx", "vy", "size", "image", "rect")
+
+    def __init__(self, x=0, y=0, vx=0, vy=0, size=1):
+        self.rect = app.pygame.Rect(0, 0, 0, 0)
+        self.reset(x, y, vx, vy, size)
+
+    def reset(self, x, y, vx, vy, size):
         self.x = x
         self.y = y
         self.vx = vx
         self.vy = vy
         self.size = size
 
-        self.image = app.pygame.Surface((self.size, self.size), app.pygame.SRCALPHA)
-        self.image.fill((255, 255, 255))
-        self.rect = self.image.get_rect(center=(self.x, self.y))
-    
-    def update(self):
-        self.x += self.vx
-        self.y += self.vy
-        self. rect.center = (self.x, self.y)
+        self.image = get_bullet_image(size)
+        self.rect.size = (size, size)
+        self.rect.center = (x, y)
+
+
+# Preallocated bullets recycled through a free list, so firing and culling
+# never create or drop objects inside the frame loop.
+class BulletPool:
+    def __init__(self, capacity=64):
+        self.free = [Bullet() for _ in range(capacity)]
+        self.active = []
+
+    def __len__(self):
+        return len(self.active)
+
+    def __iter__(self):
+        return iter(self.active)
+
+    def __bool__(self):
+        return bool(self.active)
+
+    def spawn(self, x, y, vx, vy, size):
+        bullet = self.free.pop() if self.free else Bullet()
+        bullet.reset(x, y, vx, vy, size)
+        self.active.append(bullet)
+        return bullet
+
+    def release_many(self, bullets):
+        # bullets is a set of spent bullets, filtered out in a single pass
+        if not bullets:
+            return
+        keep = []
+        for bullet in self.active:
+            if bullet in bullets:
+                self.free.append(bullet)
+            else:
+                keep.append(bullet)
+        self.active = keep
+
+    def clear(self):
+        self.free.extend(self.active)
+        self.active = []
 
-    def draw(self, surface):
-        surface.blit(self.image,self.rect)
+    def update(self, bounds):
+        # Integrate positions and cull bullets that leave bounds (the camera
+        # view) in one pass
+        left, top, right, bottom = bounds.left, bounds.top, bounds.right, bounds.bottom
+        keep = []
+        free = self.free
+        for bullet in self.active:
+            x = bullet.x + bullet.vx
+            y = bullet.y + bullet.vy
+            if y < top or y > bottom or x < left or x > right:
+                free.append(bullet)
+                continue
+            bullet.x = x
+            bullet.y = y
+            bullet.rect.center = (x, y)
+            keep.append(bullet)
+        self.active = keep
 
-            
\ No newline at end of file
+    def render(self, queue):
+        queue.submit_many(LAYER_BULLETS, ((bullet.image, bullet.rect) for bullet in self.active))
@@ -0,0 +1,37 @@
+# camera.py
+import pygame
+
+import app
+
+
+# The part of the world shown on screen. It centres on a point (the player)
+# and stops at the world's edges; a world size of None is unbounded on that
+# axis. World positions minus the rect's top left are screen positions.
+class Camera:
+    def __init__(self, width=app.WIDTH, height=app.HEIGHT, world_width=app.WORLD_WIDTH,
+                 world_height=app.WORLD_HEIGHT):
+        self.rect = pygame.Rect(0, 0, width, height)
+        self.world_width = world_width
+        self.world_height = world_height
+
+    def follow(self, x, y):
+        left = int(round(x)) - self.rect.width // 2
+        top = int(round(y)) - self.rect.height // 2
+        if self.world_width is not None:
+            left = max(0, min(left, self.world_width - self.rect.width))
+        if self.world_height is not None:
+            top = max(0, min(top, self.world_height - self.rect.height))
+        self.rect.topleft = (left, top)
+
+
+def clamp_to_world(x, y):
+    # Keep a point inside the world on its bounded axes
+    if app.WORLD_WIDTH is not None:
+        x = max(0, min(x, app.WORLD_WIDTH))
+    if app.WORLD_HEIGHT is not None:
+        y = max(0, min(y, app.WORLD_HEIGHT))
+    return x, y
+
+
+def world_center():
+    return ((app.WORLD_WIDTH or 0) // 2, (app.WORLD_HEIGHT or 0) // 2)
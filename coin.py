@@ -1,13 +1,44 @@
+import math
+
 import app
 
+# Coin images are shared between coins of the same size
+_images = {}
+
+
+def coin_image(size):
+    image = _images.get(size)
+    if image is None:
+        image = app.pygame.Surface((size, size), app.pygame.SRCALPHA)
+        image.fill((255, 215, 0))
+        _images[size] = image
+    return image
+
+
 class Coin:
-    def __init__(self, x, y):
+    def __init__(self, x, y, value=1):
         self.x = x
         self.y = y
-        self.image = app.pygame.Surface((15, 15), app.pygame.SRCALPHA)
-        self.image.fill((255, 215, 0))
+        self.value = value
+        self.update_image()
+
+    def update_image(self):
+        # Merged coins are drawn bigger, up to COIN_MAX_SIZE
+        size = min(app.COIN_SIZE + 2 * (self.value - 1), app.COIN_MAX_SIZE)
+        self.image = coin_image(size)
         self.rect = self.image.get_rect(center=(self.x, self.y))
 
+    def add_value(self, value):
+        self.value += value
+        self.update_image()
 
-    def draw(self, surface):
-        surface.blit(self.image, self.rect)
+    def move_toward(self, x, y, step):
+        dx = x - self.x
+        dy = y - self.y
+        dist = math.hypot(dx, dy)
+        if dist <= step:
+            self.x, self.y = x, y
+        else:
+            self.x += dx / dist * step
+            self.y += dy / dist * step
+        self.rect.center = (round(self.x), round(self.y))
@@ -0,0 +1,106 @@
+# controls.py
+import pygame
+
+from simulation import TickInput, HeldKeys, NO_KEYS, MOVE_KEYS
+
+FIRE_KEY = pygame.K_SPACE
+FIRE_BUTTON = 1  # left mouse button
+UPGRADE_KEYS = (pygame.K_1, pygame.K_2, pygame.K_3)
+RESTART_KEY = pygame.K_r
+
+
+# Turns the keyboard and mouse into one TickInput per simulation tick.
+# Presses arrive as events and are buffered until the next tick, so none are
+# lost however many land between ticks. Held state is read from the devices
+# once per frame by poll() and copied into every tick the frame runs, so a
+# hitch that runs several ticks at once costs the same per tick and plays
+# out like the frames it stands in for.
+#
+# SPACE fires at the nearest enemies and the left mouse button fires at the
+# cursor; holding either one keeps firing as fast as the cooldown allows.
+class InputController:
+    def __init__(self, sim):
+        self.sim = sim
+        self.held = NO_KEYS
+        self.trigger = False
+        self.aim = None
+        # Whether the mouse or the keyboard fired last decides how shots aim
+        self.mouse_aim = False
+        self.pending = TickInput()
+
+    def handle_event(self, event):
+        # Returns True if the event was a gameplay press
+        sim = self.sim
+        pending = self.pending
+        if event.type == pygame.KEYDOWN:
+            if sim.game_over:
+                if event.key == RESTART_KEY:
+                    pending.restart = True
+                    return True
+            elif sim.in_level_up_menu:
+                if event.key in UPGRADE_KEYS:
+                    pending.upgrade = UPGRADE_KEYS.index(event.key)
+                    return True
+            elif event.key == FIRE_KEY:
+                pending.fire += 1
+                self.mouse_aim = False
+                return True
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == FIRE_BUTTON:
+            if not (sim.game_over or sim.in_level_up_menu):
+                pending.fire += 1
+                self.mouse_aim = True
+                return True
+        return False
+
+    def poll(self):
+        # Read the held keys, buttons and cursor once for the frame. The aim
+        # is turned into world coordinates against the current camera view.
+        pressed = pygame.key.get_pressed()
+        self.held = HeldKeys(key for key in MOVE_KEYS if pressed[key])
+        self.trigger = pressed[FIRE_KEY] or pygame.mouse.get_pressed()[FIRE_BUTTON - 1]
+        if self.mouse_aim:
+            mx, my = pygame.mouse.get_pos()
+            view = self.sim.camera.rect
+            self.aim = (mx + view.x, my + view.y)
+        else:
+            self.aim = None
+
+    def set_capacity(self, capacity):
+        # Hand a new enemy capacity from the frame budget to the next tick
+        self.pending.capacity = capacity
+
+    def next_tick(self):
+        tick_input = self.pending
+        tick_input.held = self.held
+        tick_input.trigger = self.trigger
+        tick_input.aim = self.aim
+        self.pending = TickInput()
+        return tick_input
+
+    def clear(self):
+        # Drop buffered presses, e.g. when the game state is replaced
+        self.pending = TickInput()
+
+
+# Feeds a fixed sequence of TickInputs (a loaded replay, a scripted test run)
+# through the same interface as InputController
+class ScriptedInput:
+    def __init__(self, inputs):
+        self.inputs = iter(inputs)
+
+    def handle_event(self, event):
+        return False
+
+    def poll(self):
+        pass
+
+    def set_capacity(self, capacity):
+        # A replay already carries the capacities it was recorded with
+        pass
+
+    def next_tick(self):
+        # None once the script has run out
+        return next(self.inputs, None)
+
+    def clear(self):
+        pass
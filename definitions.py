@@ -0,0 +1,273 @@
+# definitions.py
+import hashlib
+import json
+import operator
+import string
+
+DEFINITIONS_VERSION = 1
+
+# Largest enemy hp, the most EnemyPool's int32 hp field can hold
+MAX_ENEMY_HP = 2**31 - 1
+
+# Player attributes an effect may change or be capped by
+PLAYER_STATS = (
+    "health", "max_health", "speed", "shield_timer",
+    "bullet_speed", "bullet_size", "bullet_count", "shoot_cooldown", "magnet_radius",
+)
+
+# Stats the game uses as whole numbers (counts, sizes, tick timers). Effects
+# on them always truncate, so a fractional multiplier or a constant tuned to
+# a fraction can't leave a float behind.
+INTEGER_STATS = ("health", "max_health", "shield_timer", "bullet_size", "bullet_count", "shoot_cooldown")
+
+# Effect operations: new value from (current value, effect value)
+OPS = {
+    "add": operator.add,
+    "mul": operator.mul,
+    "set": lambda current, value: value,
+}
+
+
+class DefinitionError(ValueError):
+    pass
+
+
+def resolve(value, constants):
+    # Numbers are used as they are; a string names a constant in `constants`,
+    # looked up at use time so tuning tools can change it between games
+    return getattr(constants, value) if isinstance(value, str) else value
+
+
+# One change to a player attribute: apply op with value, optionally truncate
+# to an int, then clamp to min/max (numbers or other player attributes)
+class Effect:
+    __slots__ = ("stat", "op", "value", "integer", "minimum", "maximum")
+
+    def __init__(self, stat, op, value, integer=False, minimum=None, maximum=None):
+        self.stat = stat
+        self.op = OPS[op]
+        self.value = value
+        self.integer = integer
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def apply(self, player, constants):
+        value = self.op(getattr(player, self.stat), resolve(self.value, constants))
+        if self.integer:
+            value = int(value)
+        if self.minimum is not None:
+            value = max(value, self.bound(self.minimum, player))
+        if self.maximum is not None:
+            value = min(value, self.bound(self.maximum, player))
+        setattr(player, self.stat, value)
+
+    @staticmethod
+    def bound(limit, player):
+        return getattr(player, limit) if isinstance(limit, str) else limit
+
+
+class EnemyDef:
+    __slots__ = ("name", "sprite", "frames", "scale", "hp", "speed_value", "constants")
+
+    def __init__(self, name, sprite, frames, scale, speed, hp, constants):
+        self.name = name
+        self.sprite = sprite
+        self.frames = frames
+        self.scale = scale
+        self.hp = hp
+        self.speed_value = speed
+        self.constants = constants
+
+    @property
+    def speed(self):
+        return resolve(self.speed_value, self.constants)
+
+
+class UpgradeDef:
+    __slots__ = ("name", "template", "effects", "constants")
+
+    def __init__(self, name, template, effects, constants):
+        self.name = name
+        self.template = template
+        self.effects = effects
+        self.constants = constants
+
+    @property
+    def desc(self):
+        # {NAME} fields in the description show the constant's current value
+        return self.template.format_map(vars(self.constants))
+
+    def apply(self, player):
+        for effect in self.effects:
+            effect.apply(player, self.constants)
+
+
+class PowerUpDef:
+    __slots__ = ("name", "image", "effects", "constants")
+
+    def __init__(self, name, image, effects, constants):
+        self.name = name
+        self.image = image
+        self.effects = effects
+        self.constants = constants
+
+    def apply(self, player):
+        for effect in self.effects:
+            effect.apply(player, self.constants)
+
+
+# Enemy types, upgrades and power-ups compiled from the definitions file:
+# name -> record tables plus the name lists the spawners pick from. digest
+# identifies the file's contents, so replays and snapshots can tell when they
+# were made with different definitions.
+class Definitions:
+    def __init__(self, enemies, upgrades, powerups, digest):
+        self.enemies = enemies
+        self.upgrades = upgrades
+        self.powerups = powerups
+        self.digest = digest
+        self.enemy_names = list(enemies)
+        self.upgrade_list = list(upgrades.values())
+        self.powerup_names = list(powerups)
+
+
+# --------------------------------------------------------------------------
+#                               VALIDATION
+# --------------------------------------------------------------------------
+
+def _fail(path, message):
+    raise DefinitionError(f"{path}: {message}")
+
+
+def _check_keys(path, data, required, optional=()):
+    if not isinstance(data, dict):
+        _fail(path, "expected an object")
+    missing = [key for key in required if key not in data]
+    if missing:
+        _fail(path, f"missing {', '.join(missing)}")
+    unknown = [key for key in data if key not in required and key not in optional]
+    if unknown:
+        _fail(path, f"unknown {', '.join(unknown)}")
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _check_value(path, value, constants, positive=False):
+    # A number, or the name of a numeric constant
+    if isinstance(value, str):
+        if not hasattr(constants, value):
+            _fail(path, f"unknown constant {value!r}")
+        value = getattr(constants, value)
+    if not _is_number(value):
+        _fail(path, "expected a number or a constant name")
+    if positive and value <= 0:
+        _fail(path, "must be positive")
+
+
+def _check_whole(path, value, constants):
+    # A whole number, or the name of a constant holding one
+    if not float(resolve(value, constants)).is_integer():
+        _fail(path, "expected a whole number")
+
+
+def _check_count(path, value, maximum=None):
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        _fail(path, "expected a whole number of at least 1")
+    if maximum is not None and value > maximum:
+        _fail(path, f"expected at most {maximum}")
+
+
+def _check_name(path, value):
+    if not isinstance(value, str) or not value:
+        _fail(path, "expected a non-empty string")
+
+
+def _compile_effects(path, data, constants):
+    if not isinstance(data, list) or not data:
+        _fail(path, "expected a non-empty list")
+    effects = []
+    for i, spec in enumerate(data):
+        where = f"{path}[{i}]"
+        _check_keys(where, spec, ("stat", "op", "value"), ("integer", "min", "max"))
+        if spec["stat"] not in PLAYER_STATS:
+            _fail(f"{where}.stat", f"unknown player stat {spec['stat']!r}")
+        if spec["op"] not in OPS:
+            _fail(f"{where}.op", f"expected one of {', '.join(OPS)}")
+        _check_value(f"{where}.value", spec["value"], constants)
+        if not isinstance(spec.get("integer", False), bool):
+            _fail(f"{where}.integer", "expected true or false")
+        integer = spec["stat"] in INTEGER_STATS
+        if integer and spec["op"] != "mul":
+            # Adding or setting a whole number keeps a whole number
+            _check_whole(f"{where}.value", spec["value"], constants)
+        for key in ("min", "max"):
+            limit = spec.get(key)
+            if limit is not None and not _is_number(limit) and limit not in PLAYER_STATS:
+                _fail(f"{where}.{key}", "expected a number or a player stat")
+            # Limits are applied after truncating, so they must be whole too
+            if integer and limit is not None and not isinstance(limit, int) and limit not in INTEGER_STATS:
+                _fail(f"{where}.{key}", "expected a whole number or a whole number stat")
+        effects.append(Effect(spec["stat"], spec["op"], spec["value"], integer or spec.get("integer", False),
+                              spec.get("min"), spec.get("max")))
+    return effects
+
+
+def compile_definitions(data, constants):
+    _check_keys("definitions", data, ("version", "enemies", "upgrades", "powerups"))
+    if data["version"] != DEFINITIONS_VERSION:
+        _fail("version", f"expected {DEFINITIONS_VERSION}, got {data['version']!r}")
+
+    enemies = {}
+    if not isinstance(data["enemies"], dict) or not data["enemies"]:
+        _fail("enemies", "expected a non-empty object")
+    for name, spec in data["enemies"].items():
+        path = f"enemies.{name}"
+        _check_keys(path, spec, ("sprite", "frames", "speed", "hp"), ("scale",))
+        _check_name(f"{path}.sprite", spec["sprite"])
+        _check_count(f"{path}.frames", spec["frames"])
+        _check_count(f"{path}.hp", spec["hp"], MAX_ENEMY_HP)
+        _check_value(f"{path}.speed", spec["speed"], constants)
+        scale = spec.get("scale", 1)
+        _check_value(f"{path}.scale", scale, constants, positive=True)
+        enemies[name] = EnemyDef(name, spec["sprite"], spec["frames"], resolve(scale, constants),
+                                 spec["speed"], spec["hp"], constants)
+
+    upgrades = {}
+    if not isinstance(data["upgrades"], list) or not data["upgrades"]:
+        _fail("upgrades", "expected a non-empty list")
+    for i, spec in enumerate(data["upgrades"]):
+        path = f"upgrades[{i}]"
+        _check_keys(path, spec, ("name", "desc", "effects"))
+        _check_name(f"{path}.name", spec["name"])
+        if spec["name"] in upgrades:
+            _fail(f"{path}.name", f"duplicate upgrade {spec['name']!r}")
+        _check_name(f"{path}.desc", spec["desc"])
+        for _, field, _, _ in string.Formatter().parse(spec["desc"]):
+            if field is not None and not hasattr(constants, field):
+                _fail(f"{path}.desc", f"unknown constant {field!r}")
+        effects = _compile_effects(f"{path}.effects", spec["effects"], constants)
+        upgrades[spec["name"]] = UpgradeDef(spec["name"], spec["desc"], effects, constants)
+
+    powerups = {}
+    if not isinstance(data["powerups"], dict) or not data["powerups"]:
+        _fail("powerups", "expected a non-empty object")
+    for name, spec in data["powerups"].items():
+        path = f"powerups.{name}"
+        _check_keys(path, spec, ("image", "effects"))
+        _check_name(f"{path}.image", spec["image"])
+        effects = _compile_effects(f"{path}.effects", spec["effects"], constants)
+        powerups[name] = PowerUpDef(name, spec["image"], effects, constants)
+
+    digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+    return Definitions(enemies, upgrades, powerups, digest)
+
+
+def load_definitions(path, constants):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise DefinitionError(f"{path}: {e}") from e
+    return compile_definitions(data, constants)
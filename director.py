@@ -0,0 +1,100 @@
+# director.py
+import collections
+
+import app
+from definitions import MAX_ENEMY_HP
+
+
+# Decides how many enemies each wave adds and how tough they are. A wave is
+# worth `threat` points. While the live count is below `capacity` every point
+# is a plain enemy; past it the wave is spread over fewer enemies promoted to
+# tougher tiers (each PROMOTION_HP_FACTOR times the hp of the tier below and
+# PROMOTION_SPEED_BONUS faster), so difficulty keeps climbing while the count
+# holds. Planned spawns are queued and placed at most DIRECTOR_SPAWNS_PER_TICK
+# a tick, so a big wave never lands on a single frame.
+class SpawnDirector:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # (x, y, enemy type, tier) waiting to be placed, oldest first
+        self.queue = collections.deque()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def clear(self):
+        # The capacity is a property of the machine, not the game, so it stays
+        self.queue.clear()
+
+    def set_capacity(self, capacity):
+        self.capacity = max(app.DIRECTOR_MIN_CAPACITY, min(capacity, app.DIRECTOR_MAX_CAPACITY))
+
+    def plan(self, threat, live):
+        # Tiers for a wave worth `threat` with `live` enemies already out;
+        # empty when there is no room at all
+        count = min(threat, self.capacity - live - len(self.queue))
+        if count <= 0:
+            return []
+        factor = app.PROMOTION_HP_FACTOR
+        points = threat // count
+        tier = 0
+        while tier < app.PROMOTION_MAX_TIER and factor ** (tier + 1) <= points:
+            tier += 1
+        tiers = [tier] * count
+        # Points left over promote some of the wave one tier further
+        if tier < app.PROMOTION_MAX_TIER:
+            cost = factor ** (tier + 1) - factor ** tier
+            for i in range(min((threat - count * factor ** tier) // cost, count)):
+                tiers[i] += 1
+        return tiers
+
+    def push(self, x, y, enemy_type, tier):
+        self.queue.append((x, y, enemy_type, tier))
+
+    def take(self):
+        # This tick's batch of queued spawns
+        batch = min(len(self.queue), app.DIRECTOR_SPAWNS_PER_TICK)
+        return [self.queue.popleft() for _ in range(batch)]
+
+
+def promoted_stats(stats, tier):
+    # (speed, hp) of an enemy type promoted `tier` times, the hp capped at
+    # what the enemy pool can hold
+    hp = min(stats.hp * app.PROMOTION_HP_FACTOR ** tier, MAX_ENEMY_HP)
+    return stats.speed + tier * app.PROMOTION_SPEED_BONUS, hp
+
+
+# Measures what frames cost on this machine and picks the enemy capacity that
+# keeps them inside the frame budget. It runs on the game side from wall clock
+# times; its decisions reach the simulation as TickInput.capacity, so
+# replays reproduce them.
+class FrameBudget:
+    def __init__(self, budget_ms=app.DIRECTOR_FRAME_BUDGET_MS, capacity=app.DIRECTOR_CAPACITY):
+        self.budget_ms = budget_ms
+        self.capacity = capacity
+        self.frame_ms = None
+        self.frames = 0
+
+    def update(self, frame_ms, live):
+        # Called once per frame with its cost and the live enemy count.
+        # Returns the new capacity when it changes, otherwise None.
+        if self.frame_ms is None:
+            self.frame_ms = frame_ms
+        self.frame_ms += (frame_ms - self.frame_ms) * app.DIRECTOR_SMOOTHING
+        self.frames += 1
+        if self.frames < app.DIRECTOR_ADJUST_INTERVAL:
+            return None
+        self.frames = 0
+
+        if self.frame_ms > self.budget_ms and live > 0:
+            # Over budget: scale down to the count that would have fit
+            capacity = min(self.capacity, int(live * self.budget_ms / self.frame_ms))
+        elif self.frame_ms < self.budget_ms * app.DIRECTOR_HEADROOM and live >= self.capacity * app.DIRECTOR_HEADROOM:
+            # Comfortably inside the budget and using most of the capacity
+            capacity = int(self.capacity * app.DIRECTOR_GROWTH)
+        else:
+            return None
+        capacity = max(app.DIRECTOR_MIN_CAPACITY, min(capacity, app.DIRECTOR_MAX_CAPACITY))
+        if capacity == self.capacity:
+            return None
+        self.capacity = capacity
+        return capacity
@@ -1,76 +1,398 @@
+import numpy as np
 import pygame
 import app
 import math
 
-class Enemy:
-    def __init__(self, x, y, enemy_type, enemy_assets, speed=app.DEFAULT_ENEMY_SPEED):
-        self.x = x
-        self.y = y
-        self.speed = speed
-        
-        self.frames = enemy_assets[enemy_type]
-        self.frame_index = 0
-        self.animation_timer = 0
+from atlas import SpriteAtlas
+from render_queue import LAYER_ENEMIES, sprite_image
+from flowfield import separation
+
+
+# Struct-of-arrays store for every live enemy. Each field lives in its own
+# contiguous NumPy array so seeking, knockback and animation are a handful of
+# vectorized operations per frame instead of one Python call per enemy.
+class EnemyPool:
+    FIELDS = (
+        ("x", np.float64),
+        ("y", np.float64),
+        ("speed", np.float64),
+        ("knockback_dx", np.float64),
+        ("knockback_dy", np.float64),
+        ("knockback_dist_remaining", np.float64),
+        ("hp", np.int32),
+        ("frame_index", np.int16),
+        ("animation_timer", np.int16),
+        ("type_id", np.int16),
+        ("facing_left", np.bool_),
+        # Tick the enemy last moved on, -1 until the LOD scheduler first sees it
+        ("last_update", np.int64),
+    )
+
+    def __init__(self, enemy_assets, atlas=None, capacity=256):
+        self.enemy_assets = enemy_assets
+        self.type_names = list(enemy_assets.keys())
+        self.type_ids = {name: i for i, name in enumerate(self.type_names)}
+
+        # Per type lookup tables: frame count and (w, h) of every frame
+        max_frames = max(len(frames) for frames in enemy_assets.values())
+        self.frame_counts = np.array([len(enemy_assets[name]) for name in self.type_names], dtype=np.int16)
+        self.frame_sizes = np.zeros((len(self.type_names), max_frames, 2), dtype=np.int32)
+        for t, name in enumerate(self.type_names):
+            for f, frame in enumerate(enemy_assets[name]):
+                self.frame_sizes[t, f] = frame.get_size()
+        # How far a sprite reaches past its centre, for on-screen tests
+        self.sprite_margin = int(self.frame_sizes.max()) // 2
+
+        # images[type_id][frame][facing_left], mirrored copies prebuilt by the
+        # atlas and copied out for fast batched blitting
+        if atlas is None:
+            atlas = SpriteAtlas(enemy_assets)
+        self.images = [
+            [(sprite_image(atlas.get(name, f, False)), sprite_image(atlas.get(name, f, True)))
+             for f in range(len(enemy_assets[name]))]
+            for name in self.type_names
+        ]
+        # The same images flattened for lookup by image_code(), so a whole
+        # batch is picked with one fancy index
+        self.image_table = np.empty(len(self.type_names) * max_frames * 2, dtype=object)
+        for t, frames in enumerate(self.images):
+            for f, pair in enumerate(frames):
+                for facing, image in enumerate(pair):
+                    self.image_table[(t * max_frames + f) * 2 + facing] = image
+        self.max_frames = max_frames
+
         self.animation_speed = 8
-        self.image = self.frames[self.frame_index]
-        self.rect = self.image.get_rect(center=(self.x, self.y))
-        
-        self.enemy_type = enemy_type 
-        self.facing_left = False
-        
-        self.knockback_dist_remaining = 0
-        self.knockback_dx = 0
-        self.knockback_dy = 0
-  
+        self.count = 0
+        self.capacity = 0
+        self.views = []
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        # Grow every field array to capacity, keeping the live slots
+        for name, dtype in self.FIELDS:
+            new = np.zeros(capacity, dtype=dtype)
+            if self.capacity:
+                new[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        # Iterate over a copy so callers may remove enemies while looping
+        return iter(self.views[:self.count])
+
+    def __bool__(self):
+        return self.count > 0
+
+    def spawn(self, x, y, enemy_type, speed=app.DEFAULT_ENEMY_SPEED, hp=1):
+        if self.count == self.capacity:
+            self.allocate(self.capacity * 2)
+
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.speed[i] = speed
+        self.knockback_dx[i] = 0
+        self.knockback_dy[i] = 0
+        self.knockback_dist_remaining[i] = 0
+        self.hp[i] = hp
+        self.frame_index[i] = 0
+        self.animation_timer[i] = 0
+        self.type_id[i] = self.type_ids[enemy_type]
+        self.facing_left[i] = False
+        self.last_update[i] = -1
+        self.count += 1
+
+        enemy = Enemy(self, i)
+        self.views.append(enemy)
+        return enemy
+
+    def remove(self, enemy):
+        # Swap-remove: move the last live slot into the hole, O(1)
+        i = enemy.index
+        if i < 0:
+            return
+        last = self.count - 1
+        if i != last:
+            for name, _ in self.FIELDS:
+                arr = getattr(self, name)
+                arr[i] = arr[last]
+            moved = self.views[last]
+            moved.index = i
+            self.views[i] = moved
+        self.views.pop()
+        self.count = last
+        enemy.index = -1
+
+    def extract(self, mask):
+        # Remove every enemy in mask at once, keeping the others in order.
+        # Returns the removed enemies' fields by name.
+        n = self.count
+        keep = ~mask
+        removed = {name: getattr(self, name)[:n][mask] for name, _ in self.FIELDS}
+        kept = int(keep.sum())
+        for name, _ in self.FIELDS:
+            arr = getattr(self, name)
+            arr[:kept] = arr[:n][keep]
+        views = []
+        for enemy, keep_it in zip(self.views, keep.tolist()):
+            if keep_it:
+                enemy.index = len(views)
+                views.append(enemy)
+            else:
+                enemy.index = -1
+        self.views = views
+        self.count = kept
+        return removed
+
+    def restore(self, fields):
+        # Replace every enemy with the ones in fields (name -> array, as
+        # saved from the live slots)
+        self.clear()
+        n = len(fields["x"])
+        if n > self.capacity:
+            self.allocate(max(n, self.capacity * 2))
+        for name, _ in self.FIELDS:
+            getattr(self, name)[:n] = fields[name]
+        self.count = n
+        self.views = [Enemy(self, i) for i in range(n)]
+
+    def clear(self):
+        for enemy in self.views:
+            enemy.index = -1
+        self.views = []
+        self.count = 0
+
+    def update(self, px, py, flow=None, ticks=None, animate=None):
+        # flow is an optional FlowField; without one every enemy seeks directly.
+        # ticks optionally gives each enemy the number of ticks of movement to
+        # cover in this call, 0 leaving it where it is, and animate masks the
+        # enemies whose animation advances.
+        n = self.count
+        if n == 0:
+            return
+        if ticks is None:
+            self.move(slice(0, n), px, py, flow, 1.0)
+        else:
+            # Skipped enemies cost nothing: only the movers are gathered
+            moving = np.flatnonzero(ticks)
+            if len(moving):
+                self.move(moving, px, py, flow, ticks[moving])
+        self.animate(animate)
+
+    def move(self, index, px, py, flow, scale):
+        # Moves the enemies selected by index (a slice or index array) by
+        # scale ticks' worth
+        x = self.x[index]
+        y = self.y[index]
+        remaining = self.knockback_dist_remaining[index]
+        knockback_dx = self.knockback_dx[index]
+        knocked = remaining > 0
+        seeking = ~knocked
+        n = len(x)
+
+        # Knocked back enemies slide away from the player
+        step = np.where(knocked, np.minimum(app.ENEMY_KNOCKBACK_SPEED * scale, remaining), 0.0)
+        remaining -= step
+        x += knockback_dx * step
+        y += self.knockback_dy[index] * step
+
+        # Everyone else seeks the player, following the flow field where it
+        # covers them and heading straight for the player elsewhere
+        dx = px - x
+        dy = py - y
+        dist = np.hypot(dx, dy)
+        dir_x = np.divide(dx, dist, out=np.zeros(n), where=dist != 0)
+        dir_y = np.divide(dy, dist, out=np.zeros(n), where=dist != 0)
+        if flow is not None:
+            flow_x, flow_y, covered = flow.sample(x, y)
+            dir_x = np.where(covered, flow_x, dir_x)
+            dir_y = np.where(covered, flow_y, dir_y)
+
+        push_x, push_y = separation(x, y)
+        speed = np.where(seeking, self.speed[index] * scale, 0.0)
+        push = np.where(seeking, scale, 0.0)
+        x += dir_x * speed + push_x * push
+        y += dir_y * speed + push_y * push
+
+        self.x[index] = x
+        self.y[index] = y
+        self.knockback_dist_remaining[index] = remaining
+        self.facing_left[index] = np.where(knocked, knockback_dx < 0, dx < 0)
+
+    def animate(self, mask=None):
+        n = self.count
+        timer = self.animation_timer[:n]
+        if mask is None:
+            timer += 1
+        else:
+            timer += mask
+        advance = timer >= self.animation_speed
+        timer[advance] = 0
+        frames = self.frame_index[:n]
+        frames[advance] = (frames[advance] + 1) % self.frame_counts[self.type_id[:n][advance]]
+
+    def set_knockback(self, px, py, dist, radius=None):
+        # Shove enemies away from (px, py); with a radius, only those within it
+        n = self.count
+        dx = self.x[:n] - px
+        dy = self.y[:n] - py
+        length = np.hypot(dx, dy)
+        hit = length != 0
+        if radius is not None:
+            hit &= length <= radius
+        self.knockback_dx[:n][hit] = dx[hit] / length[hit]
+        self.knockback_dy[:n][hit] = dy[hit] / length[hit]
+        self.knockback_dist_remaining[:n][hit] = dist
+
+    def nearest(self, px, py, k=1, max_radius=None):
+        # The k enemies closest to (px, py), closest first. argpartition picks
+        # them in linear time; only those k are sorted.
+        n = self.count
+        if n == 0 or k <= 0:
+            return []
+        dist_sq = (self.x[:n] - px) ** 2 + (self.y[:n] - py) ** 2
+        index = None
+        if max_radius is not None:
+            index = np.flatnonzero(dist_sq <= max_radius * max_radius)
+            dist_sq = dist_sq[index]
+        if k == 1 and len(dist_sq):
+            closest = np.argmin(dist_sq)[None]
+        elif k < len(dist_sq):
+            closest = np.argpartition(dist_sq, k - 1)[:k]
+            closest = closest[np.argsort(dist_sq[closest], kind="stable")]
+        else:
+            closest = np.argsort(dist_sq, kind="stable")
+        if index is not None:
+            closest = index[closest]
+        views = self.views
+        return [views[i] for i in closest.tolist()]
+
+    def inside(self, rect, margin=0):
+        # Mask of the enemies whose position is within margin of rect
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        return ((x >= rect.left - margin) & (x < rect.right + margin) &
+                (y >= rect.top - margin) & (y < rect.bottom + margin))
+
+    def bounds(self):
+        # Top-left corner and size of every live enemy's rect, matching Enemy.rect
+        n = self.count
+        sizes = self.frame_sizes[self.type_id[:n], self.frame_index[:n]]
+        w = sizes[:, 0]
+        h = sizes[:, 1]
+        left = np.floor(self.x[:n] + 0.5).astype(np.int32) - w // 2
+        top = np.floor(self.y[:n] + 0.5).astype(np.int32) - h // 2
+        return left, top, w, h
+
+    def render(self, queue):
+        # Culled against the view as arrays, so only visible enemies cost
+        # any Python work
+        n = self.count
+        if n == 0:
+            return
+        left, top, w, h = self.bounds()
+        shown = queue.visible(left, top, w, h)
+        code = ((self.type_id[:n][shown].astype(np.intp) * self.max_frames + self.frame_index[:n][shown]) * 2
+                + self.facing_left[:n][shown])
+        queue.submit_batch(LAYER_ENEMIES, self.image_table[code].tolist(), left[shown], top[shown])
+
+
+# Thin object view over one slot of an EnemyPool, for code that wants to
+# treat an enemy as an object. The slot index is kept current by the pool.
+class Enemy:
+    __slots__ = ("pool", "index")
+
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+
+    def _field(name):
+        def get(self):
+            return getattr(self.pool, name)[self.index].item()
+
+        def set(self, value):
+            getattr(self.pool, name)[self.index] = value
+
+        return property(get, set)
+
+    x = _field("x")
+    y = _field("y")
+    speed = _field("speed")
+    knockback_dx = _field("knockback_dx")
+    knockback_dy = _field("knockback_dy")
+    knockback_dist_remaining = _field("knockback_dist_remaining")
+    hp = _field("hp")
+    frame_index = _field("frame_index")
+    animation_timer = _field("animation_timer")
+    facing_left = _field("facing_left")
+    del _field
+
+    @property
+    def alive(self):
+        return self.index >= 0
+
+    @property
+    def enemy_type(self):
+        return self.pool.type_names[self.pool.type_id[self.index]]
+
+    @property
+    def frames(self):
+        return self.pool.enemy_assets[self.enemy_type]
+
+    @property
+    def image(self):
+        return self.frames[self.frame_index]
+
+    @property
+    def rect(self):
+        pool = self.pool
+        i = self.index
+        w, h = pool.frame_sizes[pool.type_id[i], pool.frame_index[i]].tolist()
+        left = math.floor(pool.x[i] + 0.5) - w // 2
+        top = math.floor(pool.y[i] + 0.5) - h // 2
+        return pygame.Rect(left, top, w, h)
+
     def update(self, player):
         if self.knockback_dist_remaining > 0:
             self.apply_knockback()
-        else:        
+        else:
             self.move_toward_player(player)
-        self.animate
+        self.animate()
 
     def move_toward_player(self, player):
         # Calculates direction vector toward player
         dx = player.x - self.x
         dy = player.y - self.y
         dist = (dx**2 + dy**2) ** 0.5
-        
+
         if dist != 0:
             self.x += (dx / dist) * self.speed
             self.y += (dy / dist) * self.speed
-        
+
         self.facing_left = dx < 0
-        
-        # Updates enemy position
-        self.rect.center = (self.x, self.y)
 
     def apply_knockback(self):
         step = min (app.ENEMY_KNOCKBACK_SPEED, self.knockback_dist_remaining)
         self.knockback_dist_remaining -= step
 
-        self.x += self.knockback_dx * step 
+        self.x += self.knockback_dx * step
         self.y += self.knockback_dy * step
 
-        self. facing_left = self. knockback_dx < 0
-
-        self. rect.center = (self.x, self.y)
+        self.facing_left = self.knockback_dx < 0
 
     def animate(self):
         self.animation_timer += 1
-        if self.animation_timer >= self.animation_speed:
+        if self.animation_timer >= self.pool.animation_speed:
             self.animation_timer = 0
             self.frame_index = (self.frame_index + 1) % len(self.frames)
-            center = self.rect.center
-            self.image = self.frames[self.frame_index]
-            self.rect = self.image.get_rect()
-            self.rect.center = center
 
     def draw(self, surface):
-        if self.facing_left:
-            flipped_image = pygame.transform.flip(self.image, True, False)
-            surface.blit(flipped_image, self.rect)
-        else:
-            surface.blit(self.image, self.rect)
+        image = self.pool.images[self.pool.type_id[self.index]][self.frame_index][self.facing_left]
+        return surface.blit(image, self.rect)
 
     def set_knockback(self, px, py, dist):
         dx = self.x - px
@@ -0,0 +1,57 @@
+# events.py
+
+# Kinds of event the simulation publishes
+PLAYER_HIT = "player_hit"      # enemies touched the player this tick
+ENEMY_KILLED = "enemy_killed"  # a bullet killed an enemy
+PICKUP = "pickup"              # the player collected a coin or power-up
+LEVEL_UP = "level_up"          # the player reached a new level
+SHOT_FIRED = "shot_fired"      # the player fired a volley
+
+
+# Something that happened during a tick: its kind, where it happened and the
+# entity it concerns (the enemy, coin, power-up or new level)
+class Event:
+    __slots__ = ("kind", "x", "y", "subject")
+
+    def __init__(self, kind, x=0, y=0, subject=None):
+        self.kind = kind
+        self.x = x
+        self.y = y
+        self.subject = subject
+
+
+# Publish/subscribe hub between the collision checks and the systems that
+# react to them. Events queue up while the tick runs and dispatch() hands each
+# subscriber the whole batch for its kind at the end of the tick. Events
+# published by subscribers are delivered in the same dispatch. Kinds nobody
+# listens to are dropped at publish time.
+class EventBus:
+    def __init__(self):
+        self.subscribers = {}
+        self.queues = {}
+
+    def subscribe(self, kind, handler):
+        # handler receives a list of Events
+        self.subscribers.setdefault(kind, []).append(handler)
+
+    def unsubscribe(self, kind, handler):
+        self.subscribers[kind].remove(handler)
+
+    def publish(self, kind, x=0, y=0, subject=None):
+        if kind not in self.subscribers:
+            return
+        queue = self.queues.get(kind)
+        if queue is None:
+            queue = self.queues[kind] = []
+        queue.append(Event(kind, x, y, subject))
+
+    def clear(self):
+        self.queues = {}
+
+    def dispatch(self):
+        while self.queues:
+            queues = self.queues
+            self.queues = {}
+            for kind, batch in queues.items():
+                for handler in self.subscribers[kind]:
+                    handler(batch)
@@ -0,0 +1,71 @@
+# floor.py
+import collections
+
+import numpy as np
+import pygame
+
+import app
+
+
+def tile_noise(tx, ty, seed):
+    # Hash noise: a well-mixed 64-bit value per tile coordinate, the same for
+    # a given seed every time it is asked for
+    h = tx.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    h ^= ty.astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+    h ^= np.uint64(seed & 0xFFFFFFFFFFFFFFFF)
+    h ^= h >> np.uint64(31)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(29)
+    return h
+
+
+# The floor of an arbitrarily large world, generated a chunk of tiles at a
+# time. Which tile goes where comes from a seeded noise function, so a chunk
+# can be thrown away and rebuilt identically. Rendered chunks are kept in an
+# LRU cache, so memory stays flat however far the camera travels.
+class FloorChunks:
+    def __init__(self, tiles, seed, chunk_tiles=app.CHUNK_TILES, capacity=app.CHUNK_CACHE_SIZE):
+        self.tiles = tiles
+        self.seed = seed
+        self.tile_size = tiles[0].get_width()
+        self.chunk_tiles = chunk_tiles
+        self.chunk_size = chunk_tiles * self.tile_size
+        self.capacity = capacity
+        self.chunks = collections.OrderedDict()
+        self.rendered = 0
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def chunk(self, cx, cy):
+        surface = self.chunks.get((cx, cy))
+        if surface is not None:
+            self.chunks.move_to_end((cx, cy))
+            return surface
+
+        surface = self.render_chunk(cx, cy)
+        self.chunks[(cx, cy)] = surface
+        if len(self.chunks) > self.capacity:
+            self.chunks.popitem(last=False)
+        return surface
+
+    def render_chunk(self, cx, cy):
+        n = self.chunk_tiles
+        ty, tx = np.mgrid[cy * n:(cy + 1) * n, cx * n:(cx + 1) * n]
+        choice = (tile_noise(tx, ty, self.seed) % np.uint64(len(self.tiles))).tolist()
+
+        surface = pygame.Surface((self.chunk_size, self.chunk_size))
+        size = self.tile_size
+        tiles = self.tiles
+        surface.blits([(tiles[choice[row][col]], (col * size, row * size))
+                       for row in range(n) for col in range(n)], doreturn=False)
+        self.rendered += 1
+        return surface
+
+    def draw(self, surface, view):
+        # Cover `surface` with the floor under the world rect `view`
+        size = self.chunk_size
+        blit = surface.blit
+        for cy in range(view.top // size, (view.bottom - 1) // size + 1):
+            for cx in range(view.left // size, (view.right - 1) // size + 1):
+                blit(self.chunk(cx, cy), (cx * size - view.left, cy * size - view.top))
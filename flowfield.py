@@ -0,0 +1,126 @@
+# flowfield.py
+import math
+
+import numpy as np
+
+import app
+
+# (row offset, col offset, step cost) for the eight neighbours of a cell
+NEIGHBOURS = (
+    (-1, 0, 1.0), (1, 0, 1.0), (0, -1, 1.0), (0, 1, 1.0),
+    (-1, -1, math.sqrt(2)), (-1, 1, math.sqrt(2)), (1, -1, math.sqrt(2)), (1, 1, math.sqrt(2)),
+)
+
+
+# Shared distance field towards the player over a window of floor tiles
+# centred on them, so it works in a world of any size. It is only recomputed
+# when the player moves into another cell; in between, every enemy reads its
+# direction from the cell it stands in with one array lookup.
+#
+# obstacles(col, row, cols, rows) may return a bool array (rows, cols) of the
+# world tiles in that window that can't be entered, so walls can be added
+# later without touching the enemies. Without obstacles the field only
+# depends on the player's place in the window, so it is built once and then
+# just moved along with them.
+class FlowField:
+    def __init__(self, width, height, tile_size, obstacles=None):
+        self.tile_size = tile_size
+        self.cols = -(-width // tile_size)
+        self.rows = -(-height // tile_size)
+        shape = (self.rows, self.cols)
+        self.obstacles = obstacles
+        self.blocked = np.zeros(shape, dtype=np.bool_)
+
+        self.distance = np.full(shape, np.inf)
+        self.dir_x = np.zeros(shape)
+        self.dir_y = np.zeros(shape)
+        # World tile of the window's top-left cell, and the player's tile
+        self.origin_col = 0
+        self.origin_row = 0
+        self.center = None
+        self.rebuilds = 0
+
+    def update(self, px, py):
+        # Returns True if the field had to be recomputed
+        center = (int(py // self.tile_size), int(px // self.tile_size))
+        if center == self.center:
+            return False
+        self.center = center
+        self.origin_row = center[0] - self.rows // 2
+        self.origin_col = center[1] - self.cols // 2
+        if self.obstacles is None and self.rebuilds:
+            return False
+        if self.obstacles is not None:
+            self.blocked = self.obstacles(self.origin_col, self.origin_row, self.cols, self.rows)
+        self.rebuild((self.rows // 2, self.cols // 2))
+        return True
+
+    def rebuild(self, target):
+        rows, cols = self.rows, self.cols
+
+        # Distances are relaxed across all eight neighbours at once until they
+        # settle; a one-cell border of inf stands in for the edges
+        padded = np.full((rows + 2, cols + 2), np.inf)
+        inner = padded[1:-1, 1:-1]
+        inner[target] = 0.0
+        blocked = self.blocked
+        while True:
+            best = inner.copy()
+            for dr, dc, cost in NEIGHBOURS:
+                np.minimum(best, padded[1 + dr:rows + 1 + dr, 1 + dc:cols + 1 + dc] + cost, out=best)
+            best[blocked] = np.inf
+            if np.array_equal(best, inner):
+                break
+            inner[...] = best
+        self.distance = inner.copy()
+
+        # Steer down the distance gradient; an unreachable or edge neighbour
+        # counts as level with the cell itself
+        reachable = np.isfinite(inner)
+        level = np.where(reachable, inner, 0.0)
+
+        def neighbour(dr, dc):
+            values = padded[1 + dr:rows + 1 + dr, 1 + dc:cols + 1 + dc]
+            return np.where(np.isfinite(values), values, level)
+
+        gx = neighbour(0, -1) - neighbour(0, 1)
+        gy = neighbour(-1, 0) - neighbour(1, 0)
+        length = np.hypot(gx, gy)
+        steer = reachable & (length != 0)
+        self.dir_x = np.divide(gx, length, out=np.zeros_like(gx), where=steer)
+        self.dir_y = np.divide(gy, length, out=np.zeros_like(gy), where=steer)
+        self.rebuilds += 1
+
+    def sample(self, x, y):
+        # Direction for every position, plus a mask of the positions the field
+        # covers. Positions outside the window or within FLOW_FIELD_NEAR cells
+        # of the player are left to seek directly.
+        col = np.floor(x / self.tile_size).astype(np.intp) - self.origin_col
+        row = np.floor(y / self.tile_size).astype(np.intp) - self.origin_row
+        inside = (col >= 0) & (col < self.cols) & (row >= 0) & (row < self.rows)
+        cell = np.where(inside, row * self.cols + col, 0)
+        distance = self.distance.ravel()[cell]
+        valid = inside & (distance > app.FLOW_FIELD_NEAR) & np.isfinite(distance)
+        return self.dir_x.ravel()[cell], self.dir_y.ravel()[cell], valid
+
+
+def separation(x, y, cell_size=app.SEPARATION_CELL_SIZE, strength=app.ENEMY_SEPARATION):
+    # Push every position away from the centroid of the others sharing its
+    # cell, so a horde spreads out instead of collapsing onto one spot.
+    # Centroids come from bincount over flattened cell ids.
+    n = len(x)
+    if n < 2:
+        return np.zeros(n), np.zeros(n)
+    cx = np.floor(x / cell_size).astype(np.intp)
+    cy = np.floor(y / cell_size).astype(np.intp)
+    cx -= cx.min()
+    cy -= cy.min()
+    ids = cy * (cx.max() + 1) + cx
+
+    # Averages are taken per cell, then gathered back out per position
+    counts = np.maximum(np.bincount(ids), 1)
+    dx = x - (np.bincount(ids, weights=x) / counts)[ids]
+    dy = y - (np.bincount(ids, weights=y) / counts)[ids]
+    length = np.hypot(dx, dy)
+    scale = np.divide(strength, length, out=np.zeros(n), where=length > 1e-9)
+    return dx * scale, dy * scale
@@ -1,348 +1,332 @@
 # game.py
-import math
 import pygame
-import random
 import os
 
 import app
-from coin import Coin
-from player import Player
-from enemy import Enemy
-
+from audio import create_mixer
+from controls import InputController, ScriptedInput
+from director import FrameBudget
+from pipeline import FrameState, SimulationWorker
+from simulation import Simulation
+from replay import ReplayRecorder
+from snapshot import Snapshot, SnapshotError, SnapshotWriter
+from profiler import FrameProfiler
+from hud import HUD
+from renderer import ScreenRenderer
+from floor import FloorChunks
+from render_queue import RenderQueue, LAYER_COINS, LAYER_POWERUPS
+
+# Window, input and rendering on top of a Simulation. The simulation is
+# stepped at a fixed dt; rendering happens once per displayed frame.
 class Game:
-    def __init__(self):
+    def __init__(self, profile=False, dirty_rects=app.DIRTY_RECT_RENDERING, record=None, replay=None,
+                 mute=False, snapshot=None, pipelined=app.PIPELINED_SIMULATION):
         pygame.init()
         self.screen = pygame.display.set_mode((app.WIDTH, app.HEIGHT))
         pygame.display.set_caption("Shooter")
         self.clock = pygame.time.Clock()
-
-        self.powerups = []
-        self.powerup_spawn_timer = 0
-        self.powerup_spawn_interval = 300
-
-        self.assets = app.load_assets() 
-        self.player = Player(x=100, y=200, assets=self.assets)  
-
-
+        self.running = True
 
         font_path = os.path.join("assets", "PressStart2P.ttf")
         self.font_small = pygame.font.Font(font_path, 18)
         self.font_large = pygame.font.Font(font_path, 32)
+        self.font_debug = pygame.font.Font(font_path, 8)
+
+        self.assets = self.load_assets()
+        self.hud = HUD(self.font_small, self.font_large, self.assets)
+
+        # The floor under the camera, redrawn from cached chunks when it moves
+        self.background = pygame.Surface((app.WIDTH, app.HEIGHT))
+        self.background_origin = None
+
+        self.renderer = ScreenRenderer(self.screen, self.background, dirty_rects)
+        self.render_queue = RenderQueue()
+        self.overlay_drawn = False
+
+        # profile=True keeps every frame for a CSV/JSON export when the game closes
+        self.profile = profile
+        self.profiler = FrameProfiler(record=profile)
+        # Adjusts how many enemies the simulation may keep alive to what
+        # frames on this machine can afford
+        self.frame_budget = FrameBudget()
+        self.sim = Simulation(self.assets, seed=replay.seed if replay else None, profiler=self.profiler)
+        # Event sounds are collected over the frame's ticks and mixed once
+        self.mixer = create_mixer(self.assets["sounds"], enabled=not mute)
+        self.mixer.bind(self.sim.events)
+        self.accumulator = 0.0
+        # Pipelined, a frame's ticks run on a worker thread while the main
+        # thread draws the state the previous frame's ticks left behind
+        self.worker = SimulationWorker() if pipelined else None
+
+        # Seeded like the simulation, so a replay walks over the same floor
+        self.floor = FloorChunks(self.assets["floor_tiles"], self.sim.seed)
+
+        # record is a path the session's inputs are saved to on exit; replay
+        # is a loaded Replay whose inputs drive the game instead of the
+        # keyboard and mouse
+        self.record_path = record
+        self.recorder = ReplayRecorder(self.sim.seed) if record else None
+        self.replaying = replay is not None
+        self.controls = ScriptedInput(replay.inputs()) if replay else InputController(self.sim)
+
+        # Quick saves are written on a background thread; snapshot is a
+        # loaded Snapshot to start from
+        self.snapshots = SnapshotWriter()
+        if snapshot:
+            self.restore_snapshot(snapshot)
+
+    # The renderer reads world state straight from the simulation
+    @property
+    def player(self):
+        return self.sim.player
+
+    @property
+    def enemies(self):
+        return self.sim.enemies
+
+    @property
+    def coins(self):
+        return self.sim.coins
+
+    @property
+    def powerups(self):
+        return self.sim.powerups
+
+    @property
+    def game_over(self):
+        return self.sim.game_over
+
+    @property
+    def in_level_up_menu(self):
+        return self.sim.in_level_up_menu
+
+    @property
+    def upgrade_options(self):
+        return self.sim.upgrade_options
+
+    def load_assets(self):
+        # Images and sounds decode on worker threads while this loop keeps the
+        # window responsive and shows how far along they are
+        loader = app.start_loading()
+        while not loader.done():
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.running = False
+            self.draw_loading_screen(*loader.progress())
+            self.clock.tick(30)
+
+        assets = app.load_assets(loader=loader)
+        loader.close()
+        return assets
+
+    def draw_loading_screen(self, done, total):
+        self.screen.fill((0, 0, 0))
+        text = self.font_small.render("Loading...", True, (255, 255, 255))
+        self.screen.blit(text, text.get_rect(center=(app.WIDTH // 2, app.HEIGHT // 2 - 30)))
+
+        bar = pygame.Rect(0, 0, app.WIDTH // 2, 16)
+        bar.center = (app.WIDTH // 2, app.HEIGHT // 2 + 10)
+        pygame.draw.rect(self.screen, (255, 255, 255), bar, 2)
+        fill = bar.inflate(-6, -6)
+        fill.width = int(fill.width * done / max(total, 1))
+        pygame.draw.rect(self.screen, (255, 255, 255), fill)
+        pygame.display.flip()
 
-        self.background = self.create_random_background(
-            app.WIDTH, app.HEIGHT, self.assets["floor_tiles"]
-        )
-
-        self.running = True
-        self.game_over = False
-
-        self.coins = []
-        self.enemies = []
-        self.enemy_spawn_timer = 0
-        self.enemy_spawn_interval = 60
-        self.enemies_per_spawn = 1  
-        self.reset_game()
-
-        self.in_level_up_menu = False
-        self.upgrade_options = []
-
-    def play_background_music(self):
-        pygame.mixer.music.play(-1)  # -1 means loop forever
-
-    def play_level_up_sound(self):
-        self.assets["sounds"]["level_up"].play()
-
-    def play_player_damage_sound(self):
-        self.assets["sounds"]["player_damage"].play()
-
-    def play_enemy_death_sound(self):
-        self.assets["sounds"]["enemy_death"].play()
-
-    def play_bullet_sound(self):
-        self.assets["sounds"]["bullet_sound"].play()
-
-    def reset_game(self):
-        self.player = Player(app.WIDTH // 2, app.HEIGHT // 2, self.assets)
-        self.enemies = []
-        self.enemy_spawn_timer = 0
-        self.enemies_per_spawn = 1
-
-        self.coins = []
-        self.game_over = False
-
-    def create_random_background(self, width, height, floor_tiles):
-        bg = pygame.Surface((width, height))
-        tile_w = floor_tiles[0].get_width()
-        tile_h = floor_tiles[0].get_height()
-
-        for y in range(0, height, tile_h):
-            for x in range(0, width, tile_w):
-                tile = random.choice(floor_tiles)
-                bg.blit(tile, (x, y))
-
-        return bg
+    def update_background(self, view):
+        # A scrolled camera changes every pixel, so the next frame is a full one
+        if view.topleft != self.background_origin:
+            self.floor.draw(self.background, view)
+            self.background_origin = view.topleft
+            self.renderer.invalidate()
 
     def run(self):
-        self.play_background_music()
+        self.mixer.play_music(self.assets["music"])
+        frame = self.capture_frame() if self.worker else None
         while self.running:
-            self.clock.tick(app.FPS)
-            self.handle_events()
-
-            if not self.game_over and not self.in_level_up_menu:
-                self.update()
-            
-            self.draw()
-
+            # Fixed timestep: run as many whole ticks as real time allows,
+            # capped so a long stall doesn't snowball into a catch-up spiral
+            frame_time = self.clock.tick(app.FPS) / 1000
+            self.accumulator += min(frame_time, app.MAX_FRAME_TIME)
+            self.profiler.begin_frame()
+
+            with self.profiler.stage("events"):
+                self.handle_events()
+            inputs = self.take_inputs()
+            if self.worker:
+                # This frame's ticks run while the state the last ones left
+                # is drawn. Outside submit/wait the worker is idle, so events,
+                # audio and the next capture may read the simulation.
+                self.worker.submit(self.run_ticks, inputs)
+                self.present_frame(frame)
+                self.worker.wait()
+            else:
+                self.run_ticks(inputs)
+            if any(tick_input.restart for tick_input in inputs):
+                self.renderer.invalidate()
+            with self.profiler.stage("audio"):
+                self.mixer.flush()
+
+            if self.worker:
+                frame = self.capture_frame()
+            else:
+                self.draw()
+            self.profiler.end_frame(
+                ticks=len(inputs),
+                enemies=len(self.enemies),
+                bullets=len(self.player.bullets),
+                coins=len(self.coins),
+                powerups=len(self.powerups),
+            )
+            capacity = self.frame_budget.update(self.profiler.last("frame"), self.sim.live_enemies())
+            if capacity is not None:
+                self.controls.set_capacity(capacity)
+
+        if self.profile:
+            for path in self.profiler.export():
+                print(f"Wrote {path}")
+        if self.recorder:
+            self.recorder.save(self.record_path)
+            print(f"Wrote {self.record_path} ({self.recorder.tick_count} ticks)")
+        self.snapshots.close()
+        if self.worker:
+            self.worker.close()
         pygame.quit()
 
     def handle_events(self):
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.running = False
-                elif event.type == pygame.KEYDOWN:
-                    if self.game_over:
-                        if event.key == pygame.K_r:
-                            self.reset_game()
-                        elif event.key == pygame.K_ESCAPE:
-                            self.running = False
-                    else:
-                        # Normal gameplay
-                        if not self.in_level_up_menu:
-                            if event.key == pygame.K_SPACE:
-                                nearest_enemy = self.find_nearest_enemy()
-                                if nearest_enemy:
-                                    self.player.shoot_toward_enemy(nearest_enemy)
-                                    self.play_bullet_sound()
-                        else:
-                            # In upgrade menu
-                            if event.key in [pygame.K_1, pygame.K_2, pygame.K_3]:
-                                index = event.key - pygame.K_1  # 0,1,2
-                                if 0 <= index < len(self.upgrade_options):
-                                    upgrade = self.upgrade_options[index]
-                                    self.player.apply_upgrade(self.player, upgrade)  # Use apply_upgrade
-                                    self.in_level_up_menu = False       
-
-
-    def update(self):
-        self.player.handle_input()
-        self.player.update()
-
-        for enemy in self.enemies:
-            enemy.update(self.player)
-
-        self.check_player_enemy_collisions()
-        self.check_bullet_enemy_collisions()
-        self.check_player_coin_collisions()
-
-        if self.player.health <= 0:
-            self.game_over = True
-            return 
-        self.spawn_enemies()
-        self.check_for_level_up()
-
-        self.spawn_powerups()
-        self.check_player_powerup_collisions()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.profiler.show_overlay = not self.profiler.show_overlay
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                    for path in self.profiler.export():
+                        print(f"Wrote {path}")
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                    self.renderer.set_dirty_rects(not self.renderer.dirty_rects)
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F6:
+                    self.save_snapshot(app.SNAPSHOT_PATH)
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                    self.load_snapshot(app.SNAPSHOT_PATH)
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE and self.game_over:
+                    self.running = False
+                else:
+                    # Gameplay presses are buffered for the next tick
+                    self.controls.handle_event(event)
+            self.controls.poll()
+
+    def save_snapshot(self, path):
+        future = self.snapshots.save(self.sim, path)
+        future.add_done_callback(lambda done: self.report_snapshot_saved(done, path))
+
+    def report_snapshot_saved(self, done, path):
+        # Runs on the writer thread once the file is written or failed
+        error = done.exception()
+        if error is not None:
+            print(f"Couldn't save {path}: {error}")
+        else:
+            print(f"Wrote {done.result()}")
+
+    def load_snapshot(self, path):
+        # A restored game can't be replayed from the seed alone
+        if self.recorder or self.replaying:
+            print("Snapshots can't be loaded while recording or replaying")
+            return
+        try:
+            snapshot = Snapshot.load(path, self.sim.definitions)
+        except SnapshotError as e:
+            print(f"Couldn't load {path}: {e}")
+            return
+        self.restore_snapshot(snapshot)
+
+    def restore_snapshot(self, snapshot):
+        for name, saved, current in snapshot.mismatched_constants():
+            print(f"Warning: {name} was {saved} when saved, now {current}")
+        seed = self.sim.seed
+        snapshot.restore(self.sim)
+        if self.sim.seed != seed:
+            self.floor = FloorChunks(self.assets["floor_tiles"], self.sim.seed)
+        self.background_origin = None
+        self.controls.clear()
+        # The saved capacity was measured on whatever machine saved it
+        self.controls.set_capacity(self.frame_budget.capacity)
+        self.renderer.invalidate()
+
+    def take_inputs(self):
+        # One TickInput for every whole tick real time allows
+        inputs = []
+        while self.accumulator >= self.sim.dt:
+            self.accumulator -= self.sim.dt
+            tick_input = self.controls.next_tick()
+            if tick_input is None:
+                # The replay has run out
+                self.running = False
+                break
+            inputs.append(tick_input)
+        return inputs
 
+    def run_ticks(self, inputs):
+        # Runs on the worker when pipelined, so it touches nothing but the
+        # simulation and the recorder
+        for tick_input in inputs:
+            self.sim.advance(tick_input)
+            if self.recorder:
+                self.recorder.record(tick_input)
 
     def draw(self):
-        self.screen.blit(self.background, (0, 0))
-
-        for coin in self.coins:
-            coin.draw(self.screen)
-
-        if not self.game_over:
-            self.player.draw(self.screen) 
-
-        for enemy in self.enemies:
-            enemy.draw(self.screen)
-            
-        if self.in_level_up_menu:
-            self.draw_upgrade_menu()
+        self.present_frame(self.capture_frame())
+
+    def capture_frame(self):
+        # Everything the next frame shows, copied out of the simulation.
+        # World sprites are queued by layer and culled against the camera view.
+        frame = FrameState(self.sim)
+        view = frame.view
+        queue = self.render_queue
+        queue.begin(view)
+        with self.profiler.stage("queue_sprites"):
+            queue.submit_many(LAYER_COINS, ((coin.image, coin.rect) for coin in self.sim.coins.query(view)))
+            queue.submit_many(LAYER_POWERUPS, ((powerup.image, powerup.rect)
+                                               for powerup in self.sim.powerups.query(view)))
+            if not frame.game_over:
+                self.player.render(queue)
+            self.enemies.render(queue)
+        return frame
+
+    def present_frame(self, frame):
+        # Draws a captured frame without reading the simulation, so it can
+        # run while the worker steps it
+        stage = self.profiler.stage
+        # Menu overlays are translucent and cover the whole screen, so they
+        # are redrawn from a clean background every frame they are up, and
+        # once more on the frame they go away
+        overlay = frame.in_level_up_menu or frame.game_over
+        if overlay or self.overlay_drawn:
+            self.renderer.invalidate()
+        self.overlay_drawn = overlay
+
+        with stage("draw_background"):
+            self.update_background(frame.view)
+            self.renderer.begin()
+
+        # One blits call per layer
+        with stage("draw_sprites"):
+            rects = self.render_queue.flush(self.screen, stop=LAYER_POWERUPS)
+
+        with stage("draw_menus"):
+            if frame.in_level_up_menu:
+                self.hud.draw_upgrade_menu(self.screen, frame.upgrade_options)
+
+        with stage("draw_hud"):
+            rects.extend(self.hud.draw(self.screen, frame.health, frame.xp, frame.next_level_xp))
+
+        with stage("draw_menus"):
+            if frame.game_over:
+                self.hud.draw_game_over(self.screen)
+
+        # Power-ups have always been drawn over the HUD and menus
+        with stage("draw_powerups"):
+            rects.extend(self.render_queue.flush(self.screen, start=LAYER_POWERUPS))
+
+        rects.extend(self.profiler.draw(self.screen, self.font_debug))
         
-        hp = max(0, min(self.player.health, 5))  
-        health_img = self.assets["health"][hp]
-        self.screen.blit(health_img, (10, 10))
-
-        xp_text_surf = self.font_small.render(f"XP: {self.player.xp}", True, (255, 255, 255))
-        self.screen.blit(xp_text_surf, (10, 70))
-
-        next_level_xp = self.player.level * self.player.level * 5
-        xp_to_next = max(0, next_level_xp - self.player.xp)
-        xp_next_surf = self.font_small.render(f"Next Lvl XP: {xp_to_next}", True, (255, 255, 255))
-        self.screen.blit(xp_next_surf, (10, 100))
-
-        if self.game_over:
-            self.draw_game_over_screen()
-        
-        for powerup in self.powerups:
-            powerup.draw(self.screen)
-        
-        pygame.display.flip()
-
-    def spawn_enemies(self):
-        self.enemy_spawn_timer += 1
-        if self.enemy_spawn_timer >= self.enemy_spawn_interval:
-            self.enemy_spawn_timer = 0
-
-            for _ in range(self.enemies_per_spawn):
-                side = random.choice(["top", "bottom", "left", "right"])
-                if side == "top":
-                    x = random.randint(0, app.WIDTH)
-                    y = -app.SPAWN_MARGIN
-                elif side == "bottom":
-                    x = random.randint(0, app.WIDTH)
-                    y = app.HEIGHT + app.SPAWN_MARGIN
-                elif side == "left":
-                    x = -app.SPAWN_MARGIN
-                    y = random.randint(0, app.HEIGHT)
-                else:
-                    x = app.WIDTH + app.SPAWN_MARGIN
-                    y = random.randint(0, app.HEIGHT)
-
-                enemy_type = random.choice(list(self.assets["enemies"].keys()))
-                enemy = Enemy(x, y, enemy_type, self.assets["enemies"])
-                self.enemies.append(enemy)
-
-    def check_player_enemy_collisions(self):
-        collided = False
-        for enemy in self.enemies:
-            if enemy.rect.colliderect(self.player.rect):
-                collided = True
-                break
-
-        if collided:
-            self.player.take_damage(1)
-            self.play_player_damage_sound()
-            px, py = self.player.x, self.player.y
-            for enemy in self.enemies:
-                enemy.set_knockback(px, py, app.PUSHBACK_DISTANCE)
-
-    def draw_game_over_screen(self):
-            # Dark overlay
-            overlay = pygame.Surface((app.WIDTH, app.HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 180))
-            self.screen.blit(overlay, (0, 0))
-
-            # Game Over text
-            game_over_surf = self.font_large.render("GAME OVER!", True, (255, 0, 0))
-            game_over_rect = game_over_surf.get_rect(center=(app.WIDTH // 2, app.HEIGHT // 2 - 50))
-            self.screen.blit(game_over_surf, game_over_rect)
-
-            # Prompt to restart or quit
-            prompt_surf = self.font_small.render("Press R to Play Again or ESC to Quit", True, (255, 255, 255))
-            prompt_rect = prompt_surf.get_rect(center=(app.WIDTH // 2, app.HEIGHT // 2 + 20))
-            self.screen.blit(prompt_surf, prompt_rect)
-
-    def find_nearest_enemy(self):
-        if not self.enemies:
-            return None
-        nearest = None
-        min_dist = float('inf')
-        px, py = self.player.x, self.player.y
-        for enemy in self.enemies:
-            dist = math.sqrt((enemy.x - px)**2 + (enemy.y - py)**2)
-            if dist < min_dist:
-                min_dist = dist
-                nearest = enemy
-        return nearest
-    
-    def check_bullet_enemy_collisions(self):
-        for bullet in self.player.bullets:
-            for enemy in self.enemies:          
-                if bullet.rect.colliderect(enemy.rect):
-                    self.player.bullets.remove(bullet)
-                    new_coin = Coin(enemy.x, enemy.y)
-                    self.coins.append(new_coin)  
-                    self.enemies.remove(enemy)
-                    self.play_enemy_death_sound()
-    
-    def check_player_coin_collisions(self):
-        coins_collected = []
-        for coin in self.coins:
-            if coin.rect.colliderect(self.player.rect):
-                coins_collected.append(coin)
-                self.player.add_xp(1)
-
-        for c in coins_collected:
-            if c in self.coins:
-                self.coins.remove(c) 
-
-
-
-
-
-
-
-    
-    def draw_upgrade_menu(self):
-            # Dark overlay behind the menu
-            overlay = pygame.Surface((app.WIDTH, app.HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 180))
-            self.screen.blit(overlay, (0, 0))
-
-            # Title
-            title_surf = self.font_large.render("Choose an Upgrade!", True, (255, 255, 0))
-            title_rect = title_surf.get_rect(center=(app.WIDTH // 2, app.HEIGHT // 3 - 50))
-            self.screen.blit(title_surf, title_rect)
-
-            # Options
-            for i, upgrade in enumerate(self.upgrade_options):
-                text_str = f"{i+1}. {upgrade['name']} - {upgrade['desc']}"
-                option_surf = self.font_small.render(text_str, True, (255, 255, 255))
-                line_y = app.HEIGHT // 3 + i * 40
-                option_rect = option_surf.get_rect(center=(app.WIDTH // 2, line_y))
-                self.screen.blit(option_surf, option_rect)
-
-
-    def check_for_level_up(self):
-        xp_needed = self.player.level * self.player.level * 5
-        if self.player.xp >= xp_needed:
-            # Leveled up
-            self.player.level += 1
-            self.in_level_up_menu = True
-            self.upgrade_options = self.player.pick_random_upgrades(3)  # Use pick_random_upgrades
-            self.enemies_per_spawn += 1
-            self.play_level_up_sound()
-
-    
-    def spawn_powerups(self):
-        self.powerup_spawn_timer += 1
-        if self.powerup_spawn_timer >= self.powerup_spawn_interval:
-            self.powerup_spawn_timer = 0
-            x = random.randint(0, app.WIDTH)
-            y = random.randint(0, app.HEIGHT)
-            powerup_type = random.choice(["health", "speed", "shield"])
-            powerup = PowerUp(x, y, powerup_type, self.assets)  # Pass assets
-            self.powerups.append(powerup)
-
-    def check_player_powerup_collisions(self):
-        powerups_collected = []
-        for powerup in self.powerups:
-            if powerup.rect.colliderect(self.player.rect):
-                powerups_collected.append(powerup)
-                powerup.apply_effect(self.player)
-
-        for p in powerups_collected:
-            if p in self.powerups:
-                self.powerups.remove(p)
-
-class PowerUp(pygame.sprite.Sprite):
-    def __init__(self, x, y, powerup_type, assets):  # Add assets parameter
-        super().__init__()
-        self.x = x
-        self.y = y
-        self.powerup_type = powerup_type
-        self.image = assets["powerups"][powerup_type]  # Use loaded images
-        self.rect = self.image.get_rect(center=(x, y))
-
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
-
-    def apply_effect(self, player):
-        if self.powerup_type == "health":
-            player.health = min(player.health + 2, player.max_health)
-        elif self.powerup_type == "speed":
-            player.speed *= 1.5
-        elif self.powerup_type == "shield":
-            player.shield_timer = 180  # 3 seconds of shield
-    
+        with stage("flip"):
+            self.renderer.present(rects)
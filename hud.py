@@ -0,0 +1,116 @@
+# hud.py
+import collections
+
+import pygame
+
+import app
+
+WHITE = (255, 255, 255)
+
+
+# Rendered text surfaces keyed by (font, string, color). The least recently
+# used entry is evicted once the cache is full.
+class TextCache:
+    def __init__(self, capacity=app.TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.surfaces = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.surfaces.move_to_end(key)
+            return surf
+
+        surf = font.render(text, True, color)
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surf
+
+
+# Health bar, XP labels and the full-screen menus. Labels are only rendered
+# again when the value behind them changes, and the menu overlays are built
+# once and reused until their contents change.
+class HUD:
+    def __init__(self, font_small, font_large, assets):
+        self.font_small = font_small
+        self.font_large = font_large
+        self.health_images = assets["health"]
+        self.text = TextCache()
+
+        self.xp = None
+        self.xp_to_next = None
+        self.xp_surf = None
+        self.xp_next_surf = None
+
+        self.game_over_layer = self.build_game_over_layer()
+        self.upgrade_options = None
+        self.upgrade_layer = None
+
+    def build_overlay(self):
+        # Dark translucent layer the menus are drawn onto
+        overlay = pygame.Surface((app.WIDTH, app.HEIGHT), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+        return overlay
+
+    def build_game_over_layer(self):
+        layer = self.build_overlay()
+
+        # Game Over text
+        game_over_surf = self.text.render(self.font_large, "GAME OVER!", (255, 0, 0))
+        game_over_rect = game_over_surf.get_rect(center=(app.WIDTH // 2, app.HEIGHT // 2 - 50))
+        layer.blit(game_over_surf, game_over_rect)
+
+        # Prompt to restart or quit
+        prompt_surf = self.text.render(self.font_small, "Press R to Play Again or ESC to Quit", WHITE)
+        prompt_rect = prompt_surf.get_rect(center=(app.WIDTH // 2, app.HEIGHT // 2 + 20))
+        layer.blit(prompt_surf, prompt_rect)
+        return layer
+
+    def build_upgrade_layer(self, upgrade_options):
+        layer = self.build_overlay()
+
+        # Title
+        title_surf = self.text.render(self.font_large, "Choose an Upgrade!", (255, 255, 0))
+        title_rect = title_surf.get_rect(center=(app.WIDTH // 2, app.HEIGHT // 3 - 50))
+        layer.blit(title_surf, title_rect)
+
+        # Options
+        for i, upgrade in enumerate(upgrade_options):
+            text_str = f"{i+1}. {upgrade.name} - {upgrade.desc}"
+            option_surf = self.text.render(self.font_small, text_str, WHITE)
+            line_y = app.HEIGHT // 3 + i * 40
+            option_rect = option_surf.get_rect(center=(app.WIDTH // 2, line_y))
+            layer.blit(option_surf, option_rect)
+        return layer
+
+    def draw(self, surface, health, xp, next_level_xp):
+        # Returns the rects drawn, for dirty-rect rendering
+        hp = max(0, min(health, 5))
+        rects = [surface.blit(self.health_images[hp], (10, 10))]
+
+        if xp != self.xp:
+            self.xp = xp
+            self.xp_surf = self.text.render(self.font_small, f"XP: {xp}", WHITE)
+        rects.append(surface.blit(self.xp_surf, (10, 70)))
+
+        xp_to_next = max(0, next_level_xp - xp)
+        if xp_to_next != self.xp_to_next:
+            self.xp_to_next = xp_to_next
+            self.xp_next_surf = self.text.render(self.font_small, f"Next Lvl XP: {xp_to_next}", WHITE)
+        rects.append(surface.blit(self.xp_next_surf, (10, 100)))
+        return rects
+
+    def draw_game_over(self, surface):
+        surface.blit(self.game_over_layer, (0, 0))
+
+    def draw_upgrade_menu(self, surface, upgrade_options):
+        # A new level up hands out a new options list, which marks the layer dirty
+        if upgrade_options is not self.upgrade_options:
+            self.upgrade_options = upgrade_options
+            self.upgrade_layer = self.build_upgrade_layer(upgrade_options)
+        surface.blit(self.upgrade_layer, (0, 0))
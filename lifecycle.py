@@ -0,0 +1,79 @@
+# lifecycle.py
+import collections
+
+from spatial import SpatialHash
+
+
+# The live entities of one kind (coins, power-ups), kept within a memory
+# budget. At most `cap` are alive at once, the oldest going first to make
+# room, and each expires `ttl` ticks after it last appeared or was refreshed
+# (None keeps it until collected). Everything is indexed in a SpatialHash so
+# pickups and drawing only look at nearby entities.
+class EntityLifecycle:
+    def __init__(self, cap, ttl=None):
+        self.cap = cap
+        self.ttl = ttl
+        self.grid = SpatialHash()
+        # entity -> tick it expires on, oldest first. With one ttl per kind,
+        # age order is also expiry order.
+        self.expiry = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.expiry)
+
+    def __iter__(self):
+        return iter(list(self.expiry))
+
+    def clear(self):
+        self.expiry.clear()
+        self.grid.clear()
+
+    def add(self, entity, tick):
+        while len(self.expiry) >= self.cap:
+            oldest, _ = self.expiry.popitem(last=False)
+            self.grid.remove(oldest)
+        self.expiry[entity] = None if self.ttl is None else tick + self.ttl
+        self.grid.insert(entity)
+
+    def restore(self, entity, expires):
+        # Re-add a saved entity with its saved expiry tick, oldest first
+        self.expiry[entity] = expires
+        self.grid.insert(entity)
+
+    def remove(self, entity):
+        if self.expiry.pop(entity, False) is not False:
+            self.grid.remove(entity)
+
+    def refresh(self, entity, tick):
+        # The entity changed (moved, grew): reindex it and restart its ttl
+        self.expiry.move_to_end(entity)
+        self.expiry[entity] = None if self.ttl is None else tick + self.ttl
+        self.grid.update(entity)
+
+    def moved(self, entity):
+        self.grid.update(entity)
+
+    def expire(self, tick):
+        # Drop everything whose time is up. Only the oldest entries are looked at.
+        if self.ttl is None:
+            return
+        expiry = self.expiry
+        while expiry:
+            entity, ends = next(iter(expiry.items()))
+            if ends > tick:
+                break
+            del expiry[entity]
+            self.grid.remove(entity)
+
+    def query(self, rect):
+        return self.grid.query(rect)
+
+    def collide(self, rect):
+        return self.grid.collide(rect)
+
+    def within_radius(self, x, y, radius):
+        return self.grid.within_radius(x, y, radius)
+
+    def nearest(self, x, y, max_radius=None):
+        found = self.grid.nearest(x, y, 1, max_radius)
+        return found[0] if found else None
@@ -0,0 +1,141 @@
+# lod.py
+import math
+
+import numpy as np
+
+import app
+
+
+# Enemies far from the player folded into one marker. The group walks
+# straight at the player as a single point at its slowest member's speed and
+# keeps each member's type, speed and hit points for when it is released.
+class EnemyGroup:
+    __slots__ = ("x", "y", "speed", "types", "speeds", "hps")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.speed = math.inf
+        self.types = []
+        self.speeds = []
+        self.hps = []
+
+    def __len__(self):
+        return len(self.types)
+
+    def add(self, enemy_type, speed, hp):
+        self.types.append(enemy_type)
+        self.speeds.append(speed)
+        self.hps.append(hp)
+        self.speed = min(self.speed, speed)
+
+
+# Simulation level of detail. How much work an enemy gets depends on how far
+# it is outside the camera view:
+#
+#   on screen          moves and animates every tick
+#   near the view      moves every tick (it can reach the player or a bullet)
+#   within MID_MARGIN  moves every OFFSCREEN_UPDATE_INTERVAL ticks
+#   further out        moves every LOD_FAR_INTERVAL ticks
+#   past AGGREGATE     folded into an EnemyGroup
+#
+# Each amortized update covers all the ticks the enemy skipped in one larger
+# step. Enemies spawned on different ticks fall due on different ticks, which
+# spreads the work out. Groups are released back into the pool once they come
+# within LOD_RELEASE_MARGIN of the view, which is closer than the fold distance
+# so enemies on the boundary don't flip back and forth.
+class LODScheduler:
+    def __init__(self, camera, rng):
+        self.camera = camera
+        self.rng = rng
+        self.groups = []
+
+    def __len__(self):
+        # Enemies currently held in groups
+        return sum(len(group) for group in self.groups)
+
+    def clear(self):
+        self.groups = []
+
+    def near_view(self, x, y, margin):
+        view = self.camera.rect
+        return (view.left - margin <= x < view.right + margin and
+                view.top - margin <= y < view.bottom + margin)
+
+    def in_range(self, x, y):
+        # Whether an enemy at (x, y) belongs in the pool rather than a group
+        return self.near_view(x, y, app.LOD_AGGREGATE_MARGIN)
+
+    def hold(self, x, y, enemy_type, speed, hp):
+        # Add an enemy to the group covering (x, y), starting one if needed
+        size = app.LOD_GROUP_SIZE
+        cell = (x // size, y // size)
+        for group in self.groups:
+            if (group.x // size, group.y // size) == cell:
+                break
+        else:
+            group = EnemyGroup(x, y)
+            self.groups.append(group)
+        group.add(enemy_type, speed, hp)
+
+    def schedule(self, pool, tick):
+        # Ticks of movement each pooled enemy covers this tick (0 to skip it)
+        # and which of them animate. An enemy is due once its band's interval
+        # has passed since it last moved, and then covers every tick since,
+        # so a change of band or of slot (pools reorder on removal) never
+        # drops or repeats a step.
+        n = len(pool)
+        view = self.camera.rect
+        near = pool.inside(view, app.COLLISION_CELL_SIZE)
+        mid = pool.inside(view, app.LOD_MID_MARGIN)
+        last_update = pool.last_update[:n]
+        # Enemies spawned since the last tick start counting from it
+        last_update[last_update < 0] = tick - 1
+        elapsed = tick - last_update
+        interval = np.where(near, 1, np.where(mid, app.OFFSCREEN_UPDATE_INTERVAL, app.LOD_FAR_INTERVAL))
+        due = elapsed >= interval
+        ticks = np.where(due, elapsed, 0)
+        last_update[due] = tick
+        animate = pool.inside(view, pool.sprite_margin)
+        return ticks, animate
+
+    def update(self, pool, px, py, tick):
+        # Fold far enemies into groups, march the groups and release the ones
+        # that have come back into range. Returns the released enemies.
+        view = self.camera.rect
+        far = ~pool.inside(view, app.LOD_AGGREGATE_MARGIN)
+        # Enemies still being knocked back finish their slide first
+        far &= pool.knockback_dist_remaining[:len(pool)] <= 0
+        if far.any():
+            removed = pool.extract(far)
+            for x, y, type_id, speed, hp in zip(removed["x"].tolist(), removed["y"].tolist(),
+                                                removed["type_id"].tolist(), removed["speed"].tolist(),
+                                                removed["hp"].tolist()):
+                self.hold(x, y, pool.type_names[type_id], speed, hp)
+
+        if not self.groups:
+            return []
+        interval = app.LOD_FAR_INTERVAL
+        if tick % interval == 0:
+            for group in self.groups:
+                dx = px - group.x
+                dy = py - group.y
+                dist = math.hypot(dx, dy)
+                if dist != 0:
+                    step = min(group.speed * interval, dist)
+                    group.x += dx / dist * step
+                    group.y += dy / dist * step
+
+        released = []
+        kept = []
+        spread = app.LOD_GROUP_SIZE / 2
+        for group in self.groups:
+            if not self.near_view(group.x, group.y, app.LOD_RELEASE_MARGIN):
+                kept.append(group)
+                continue
+            for enemy_type, speed, hp in zip(group.types, group.speeds, group.hps):
+                x = group.x + self.rng.uniform(-spread, spread)
+                y = group.y + self.rng.uniform(-spread, spread)
+                released.append(pool.spawn(x, y, enemy_type, speed, hp))
+        self.groups = kept
+        return released
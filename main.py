@@ -1,13 +1,97 @@
 # main.py
-from game import Game
-from player import Player
+import argparse
+import time
+
+import app
 
 # commit after all the copying and pasting check
 
 def main():
-    game = Game()
+    parser = argparse.ArgumentParser(description="Shooter game")
+    parser.add_argument("--headless", action="store_true",
+                        help="run the simulation with no window or audio, as fast as possible")
+    parser.add_argument("--ticks", type=int, default=10000, help="ticks to simulate in headless mode")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for the simulation")
+    parser.add_argument("--profile", action="store_true",
+                        help="record per-frame timings and export them as CSV/JSON on exit")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="only redraw and present the screen regions that changed")
+    parser.add_argument("--mute", action="store_true", help="play without sound")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="simulate the next tick on a worker thread while the current one is drawn")
+    parser.add_argument("--record", metavar="PATH", help="save the session's inputs as a replay on exit")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="play back a recorded session (fast-forwarded when combined with --headless)")
+    parser.add_argument("--snapshot", metavar="PATH", help="start from a saved snapshot")
+    parser.add_argument("--save-snapshot", metavar="PATH",
+                        help="save a snapshot when a headless run finishes")
+    args = parser.parse_args()
+    if args.snapshot and (args.record or args.replay):
+        parser.error("--snapshot can't be combined with --record or --replay")
+    if args.save_snapshot and not args.headless:
+        parser.error("--save-snapshot needs --headless (press F6 to save in game)")
+
+    snapshot = None
+    if args.snapshot:
+        from snapshot import Snapshot, SnapshotError
+
+        try:
+            snapshot = Snapshot.load(args.snapshot)
+        except SnapshotError as e:
+            parser.error(str(e))
+
+    replay = None
+    if args.replay:
+        from replay import Replay
+
+        replay = Replay.load(args.replay)
+        for name, recorded, current in replay.mismatched_constants():
+            print(f"Warning: {name} was {recorded} when recorded, now {current}; playback may diverge")
+
+    if args.headless and replay:
+        from profiler import FrameProfiler
+        from replay import play_headless
+
+        profiler = FrameProfiler(record=True) if args.profile else None
+        start = time.perf_counter()
+        sim = play_headless(replay, profiler)
+        elapsed = time.perf_counter() - start
+        print(f"Replayed {len(replay)} ticks in {elapsed:.2f}s ({len(replay) / max(elapsed, 1e-9):.0f} ticks/s), "
+              f"level {sim.player.level}, {len(sim.enemies)} enemies alive, game over: {sim.game_over}")
+        if profiler:
+            slowest = sorted(profiler.history, key=lambda row: row["frame_ms"], reverse=True)[:5]
+            for row in slowest:
+                print(f"  tick {row['frame']}: {row['frame_ms']:.3f} ms, {row['enemies']} enemies")
+            for path in profiler.export():
+                print(f"Wrote {path}")
+        return
+
+    if args.headless:
+        from simulation import run_headless
+
+        first_tick = 0
+        if snapshot:
+            first_tick = snapshot.state["tick"]
+            for name, saved, current in snapshot.mismatched_constants():
+                print(f"Warning: {name} was {saved} when saved, now {current}")
+        start = time.perf_counter()
+        sim = run_headless(args.ticks, seed=args.seed, snapshot=snapshot)
+        elapsed = time.perf_counter() - start
+        ticks = sim.tick - first_tick
+        print(f"{ticks} ticks in {elapsed:.2f}s ({ticks / max(elapsed, 1e-9):.0f} ticks/s), "
+              f"level {sim.player.level}, {len(sim.enemies)} enemies alive")
+        if args.save_snapshot:
+            from snapshot import Snapshot
+
+            print(f"Wrote {Snapshot.capture(sim).save(args.save_snapshot)}")
+        return
+
+    from game import Game
+
+    game = Game(profile=args.profile, dirty_rects=args.dirty_rects or app.DIRTY_RECT_RENDERING,
+                record=args.record, replay=replay, mute=args.mute, snapshot=snapshot,
+                pipelined=args.pipelined or app.PIPELINED_SIMULATION)
     game.run()
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,42 @@
+# pipeline.py
+import concurrent.futures
+
+
+# What drawing needs from the simulation at one tick, besides the sprites
+# themselves (those are captured into the RenderQueue as images and screen
+# positions). Everything is copied, so the simulation can move on to the
+# next tick while this one is drawn.
+class FrameState:
+    __slots__ = ("view", "game_over", "in_level_up_menu", "upgrade_options", "health", "xp", "next_level_xp")
+
+    def __init__(self, sim):
+        player = sim.player
+        self.view = sim.camera.rect.copy()
+        self.game_over = sim.game_over
+        self.in_level_up_menu = sim.in_level_up_menu
+        # A level up hands out a new list rather than changing this one
+        self.upgrade_options = sim.upgrade_options
+        self.health = player.health
+        self.xp = player.xp
+        self.next_level_xp = player.xp_for_next_level()
+
+
+# Runs the simulation's ticks on a background thread, one frame's worth at a
+# time: submit() starts them and wait() blocks until they are done, returning
+# the result and re-raising anything they raised. The simulation belongs to
+# the worker in between, so nothing else may touch it until wait() returns.
+class SimulationWorker:
+    def __init__(self):
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="simulation")
+        self.job = None
+
+    def submit(self, fn, *args):
+        self.job = self.pool.submit(fn, *args)
+
+    def wait(self):
+        job, self.job = self.job, None
+        return job.result() if job else None
+
+    def close(self):
+        self.wait()
+        self.pool.shutdown(wait=True)
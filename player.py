@@ -3,7 +3,21 @@ import random
 import pygame
 import app
 
-from bullet import Bullet
+from bullet import BulletPool
+from camera import clamp_to_world
+from render_queue import LAYER_PLAYER, LAYER_EFFECTS
+
+# Shield outlines by radius, drawn once and queued like any other sprite
+_shield_images = {}
+
+def get_shield_image(radius):
+    image = _shield_images.get(radius)
+    if image is None:
+        size = radius * 2 + 1
+        image = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(image, (0, 0, 255), (radius, radius), radius, 3)
+        _shield_images[radius] = image
+    return image
 
 class Player:
     def __init__(self, x, y, assets):
@@ -23,6 +37,7 @@ class Player:
         self.facing_left = False
 
         self.xp = 0
+        self.magnet_radius = app.COIN_MAGNET_RADIUS
 
         self.health = 5 
         self.max_health = 5
@@ -33,16 +48,18 @@ class Player:
         self.bullet_size = 10
         self.bullet_count = 1
         self.shoot_cooldown = 20
-        self.shoot_timer = 0
-        self.bullets = []
+        # Ticks since the last shot, counted up to the cooldown
+        self.shoot_timer = self.shoot_cooldown
+        self.bullets = BulletPool()
 
         self.level = 1
 
 
 
-    def handle_input(self):
+    def handle_input(self, keys=None):
         # TODO: 1. Capture Keyboard Input
-        keys = pygame.key.get_pressed()
+        if keys is None:
+            keys = pygame.key.get_pressed()
 
         # velocity in X, Y direction 
         vel_x, vel_y = 0, 0
@@ -62,8 +79,7 @@ class Player:
         self.y += vel_y
 
         # TODO: 3. Clamp player position to screen bounds
-        self.x = max(0, min(self.x, app.WIDTH))
-        self.y = max(0, min(self.y, app.HEIGHT))
+        self.x, self.y = clamp_to_world(self.x, self.y)
         self.rect.center = (self.x, self.y)
 
         # animation state
@@ -78,12 +94,9 @@ class Player:
         elif vel_x > 0:
             self.facing_left = False  
 
-    def update(self):
-        for bullet in self.bullets:
-            bullet.update()
-            
-            if bullet.y < 0 or bullet.y > app.HEIGHT or bullet.x < 0 or bullet.x > app.WIDTH:
-                self.bullets.remove(bullet)
+    def update(self, view):
+        # Bullets that leave the camera view are dropped
+        self.bullets.update(view)
 
         self.animation_timer += 1
         if self.animation_timer >= self.animation_speed:
@@ -95,23 +108,24 @@ class Player:
             self.rect = self.image.get_rect()
             self.rect.center = center
 
+        if self.shoot_timer < self.shoot_cooldown:
+            self.shoot_timer += 1
+
         if self.shield_timer > 0:
             self.shield_timer -= 1
-            print(f"Shield Timer: {self.shield_timer}")
        
-    def draw(self, surface):
-        if self.facing_left:
-            flipped_img = pygame.transform.flip(self.image, True, False)
-            surface.blit(flipped_img, self.rect)
-        else:
-            surface.blit(self.image, self.rect)
+    def render(self, queue):
+        # Mirrored frames are prebuilt in the atlas, nothing is flipped here
+        image = self.assets["atlas"].get("player_" + self.state, self.frame_index, self.facing_left)
+        queue.submit(LAYER_PLAYER, image, self.rect)
 
-        for bullet in self.bullets:
-            bullet.draw(surface)
+        self.bullets.render(queue)
 
         if self.shield_timer > 0:
                 # Draw a shield effect around the player
-                pygame.draw.circle(surface, (0, 0, 255), self.rect.center, self.rect.width + 10, 3)
+                radius = self.rect.width + 10
+                shield = get_shield_image(radius)
+                queue.submit(LAYER_EFFECTS, shield, shield.get_rect(center=self.rect.center))
 
     def take_damage(self, amount):
         if self.shield_timer <= 0:
@@ -119,15 +133,19 @@ class Player:
 
         self.health = max(0, self.health - amount)
 
+    def can_shoot(self):
+        return self.shoot_timer >= self.shoot_cooldown
+
+    # The shoot_toward methods return True if a volley was fired
     def shoot_toward_position(self, tx, ty):
-        if self.shoot_timer >= self.shoot_cooldown:
-            return
+        if not self.can_shoot():
+            return False
 
         dx = tx - self.x
         dy = ty - self.y
         dist = math.sqrt(dx**2 + dy**2)
         if dist == 0:
-            return
+            return False
 
         vx = (dx / dist) * self.bullet_speed
         vy = (dy / dist) * self.bullet_speed
@@ -144,38 +162,55 @@ class Player:
             final_vx = math.cos(angle) * self.bullet_speed
             final_vy = math.sin(angle) * self.bullet_speed
 
-            bullet = Bullet(self.x, self.y, final_vx, final_vy, self.bullet_size)
-            self.bullets.append(bullet)
+            self.bullets.spawn(self.x, self.y, final_vx, final_vy, self.bullet_size)
         self.shoot_timer = 0
+        return True
 
     def shoot_toward_mouse(self, pos):
+        # pos is the mouse position in world coordinates
         mx, my = pos # m denotes mouse
-        self.shoot_toward_position(mx, my)
+        return self.shoot_toward_position(mx, my)
 
     def shoot_toward_enemy(self, enemy):
-        self.shoot_toward_position(enemy.x, enemy.y)
+        return self.shoot_toward_position(enemy.x, enemy.y)
+
+    def shoot_toward_enemies(self, enemies):
+        # One bullet per target, cycling if there are more bullets than targets.
+        # A lone target gets the usual spread volley.
+        if len(enemies) == 1:
+            return self.shoot_toward_enemy(enemies[0])
+        if not self.can_shoot():
+            return False
+
+        fired = False
+        for i in range(self.bullet_count):
+            enemy = enemies[i % len(enemies)]
+            dx = enemy.x - self.x
+            dy = enemy.y - self.y
+            dist = math.sqrt(dx**2 + dy**2)
+            if dist == 0:
+                continue
+            vx = (dx / dist) * self.bullet_speed
+            vy = (dy / dist) * self.bullet_speed
+            self.bullets.spawn(self.x, self.y, vx, vy, self.bullet_size)
+            fired = True
+        # Targets all on top of the player: nothing fired, keep the cooldown
+        if fired:
+            self.shoot_timer = 0
+        return fired
 
     def add_xp(self, amount):
             self.xp += amount
 
+    def xp_for_next_level(self):
+        return app.LEVEL_XP_FACTOR * self.level * self.level
+
 
-    def pick_random_upgrades(self, num):
-        possible_upgrades = [
-            {"name": "Bigger Bullet",  "desc": "Bullet size +5"},
-            {"name": "Faster Bullet",  "desc": "Bullet speed +2"},
-            {"name": "Extra Bullet",   "desc": "Fire additional bullet"},
-            {"name": "Shorter Cooldown", "desc": "Shoot more frequently"},
-        ]
-        return random.sample(possible_upgrades, k=num)
+    def pick_random_upgrades(self, num, rng=random):
+        possible_upgrades = self.assets["definitions"].upgrade_list
+        return rng.sample(possible_upgrades, k=min(num, len(possible_upgrades)))
     
 
     def apply_upgrade(self, player, upgrade):
-        name = upgrade["name"]
-        if name == "Bigger Bullet":
-            player.bullet_size += 5
-        elif name == "Faster Bullet":
-            player.bullet_speed += 2
-        elif name == "Extra Bullet":
-            player.bullet_count += 1
-        elif name == "Shorter Cooldown":
-            player.shoot_cooldown = max(1, int(player.shoot_cooldown * 0.8))
\ No newline at end of file
+        # upgrade is an UpgradeDef; its effects come from definitions.json
+        upgrade.apply(player)
\ No newline at end of file
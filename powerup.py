@@ -0,0 +1,15 @@
+import pygame
+
+class PowerUp(pygame.sprite.Sprite):
+    def __init__(self, x, y, powerup_type, assets):  # Add assets parameter
+        super().__init__()
+        self.x = x
+        self.y = y
+        self.powerup_type = powerup_type
+        self.image = assets["powerups"][powerup_type]  # Use loaded images
+        self.definition = assets["definitions"].powerups[powerup_type]
+        self.rect = self.image.get_rect(center=(x, y))
+
+    def apply_effect(self, player):
+        # Effects come from definitions.json
+        self.definition.apply(player)
@@ -0,0 +1,154 @@
+# profiler.py
+import collections
+import contextlib
+import csv
+import json
+import os
+import time
+
+import numpy as np
+import pygame
+
+import app
+
+
+# Times named stages of every frame and keeps a rolling window of samples per
+# stage so the overlay can show p50/p95/p99 without storing the whole session.
+# With record=True every frame is also kept for CSV/JSON export at the end.
+class FrameProfiler:
+    def __init__(self, window=app.PROFILER_WINDOW, record=False):
+        self.window = window
+        self.record = record
+        self.enabled = True
+        self.show_overlay = False
+
+        self.samples = {}
+        self.current = collections.defaultdict(float)
+        self.counts = {}
+        self.history = []
+        self.frame = 0
+        self.frame_start = None
+
+        self.overlay_lines = []
+        self.overlay_panel = None
+        self.overlay_timer = 0
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current[name] += (time.perf_counter() - start) * 1000
+
+    def begin_frame(self):
+        self.current.clear()
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self, **counts):
+        if self.frame_start is not None:
+            self.current["frame"] = (time.perf_counter() - self.frame_start) * 1000
+            self.frame_start = None
+
+        for name, ms in self.current.items():
+            window = self.samples.get(name)
+            if window is None:
+                window = self.samples[name] = collections.deque(maxlen=self.window)
+            window.append(ms)
+        self.counts = counts
+
+        if self.record:
+            row = {"frame": self.frame}
+            row.update({f"{name}_ms": round(ms, 4) for name, ms in self.current.items()})
+            row.update(counts)
+            self.history.append(row)
+        self.frame += 1
+
+    def last(self, name):
+        # Milliseconds spent in a stage (or "frame") during the last frame
+        return self.current.get(name, 0.0)
+
+    def percentiles(self, name):
+        window = self.samples.get(name)
+        if not window:
+            return 0.0, 0.0, 0.0
+        p50, p95, p99 = np.percentile(np.fromiter(window, float), [50, 95, 99])
+        return float(p50), float(p95), float(p99)
+
+    def summary(self):
+        stages = {}
+        for name in self.samples:
+            p50, p95, p99 = self.percentiles(name)
+            stages[name] = {"p50": p50, "p95": p95, "p99": p99}
+        return {"frames": self.frame, "stages": stages, "counts": dict(self.counts)}
+
+    def export(self, folder=app.PROFILE_DIR, name=None):
+        # Writes <name>.csv with one row per recorded frame and <name>.json with
+        # the rolling summary. Returns the two paths.
+        os.makedirs(folder, exist_ok=True)
+        name = name or time.strftime("profile_%Y%m%d_%H%M%S")
+        csv_path = os.path.join(folder, name + ".csv")
+        json_path = os.path.join(folder, name + ".json")
+
+        columns = []
+        for row in self.history:
+            for key in row:
+                if key not in columns:
+                    columns.append(key)
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, restval=0)
+            writer.writeheader()
+            writer.writerows(self.history)
+
+        with open(json_path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        return csv_path, json_path
+
+    def draw(self, surface, font):
+        # Returns the rects drawn, for dirty-rect rendering
+        if not self.show_overlay:
+            return []
+
+        # Re-rendering the text every frame would show up in the numbers it
+        # reports, so the lines are refreshed a few times a second
+        self.overlay_timer -= 1
+        if self.overlay_timer <= 0:
+            self.overlay_timer = app.FPS // 4
+            lines = ["stage        p50   p95   p99 ms"]
+            for name in sorted(self.samples):
+                p50, p95, p99 = self.percentiles(name)
+                lines.append(f"{name[:11]:<11}{p50:6.2f}{p95:6.2f}{p99:6.2f}")
+            lines.append(" ".join(f"{k}:{v}" for k, v in self.counts.items()))
+            self.overlay_lines = [font.render(line, True, (0, 255, 0)) for line in lines]
+
+            height = sum(line.get_height() + 2 for line in self.overlay_lines) + 8
+            width = max(line.get_width() for line in self.overlay_lines) + 8
+            self.overlay_panel = pygame.Surface((width, height), pygame.SRCALPHA)
+            self.overlay_panel.fill((0, 0, 0, 160))
+
+        x = surface.get_width() - self.overlay_panel.get_width() - 10
+        panel_rect = surface.blit(self.overlay_panel, (x, 10))
+        y = 14
+        for line in self.overlay_lines:
+            surface.blit(line, (x + 4, y))
+            y += line.get_height() + 2
+        return [panel_rect]
+
+
+# Stand-in used when nothing is being measured; stage() costs one attribute
+# lookup and a shared no-op context manager.
+class NullProfiler:
+    enabled = False
+    _stage = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._stage
+
+    def begin_frame(self):
+        pass
+
+    def end_frame(self, **counts):
+        pass
+
+    def last(self, name):
+        return 0.0
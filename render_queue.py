@@ -0,0 +1,74 @@
+# render_queue.py
+import pygame
+
+# Draw layers, back to front. The HUD and menus are drawn over all of them
+# except LAYER_POWERUPS, which is flushed separately and stays on top.
+LAYER_COINS = 0
+LAYER_PLAYER = 1
+LAYER_BULLETS = 2
+LAYER_EFFECTS = 3
+LAYER_ENEMIES = 4
+LAYER_POWERUPS = 5
+LAYER_COUNT = 6
+
+
+def sprite_image(image):
+    # A standalone, run-length encoded copy of image for sprites blitted many
+    # times a frame. RLE blits skip transparent runs instead of blending every
+    # pixel; atlas frames are subsurfaces, which can't be encoded on their own.
+    image = image.copy()
+    image.set_alpha(255, pygame.RLEACCEL)
+    return image
+
+
+# Collects the world's sprites for one frame as (image, screen position)
+# pairs in per-layer lists, then draws each layer with a single
+# Surface.blits call. Sprites are given in world coordinates; anything not
+# overlapping the view is dropped on submission.
+class RenderQueue:
+    def __init__(self, layer_count=LAYER_COUNT):
+        self.layers = [[] for _ in range(layer_count)]
+        self.view = None
+
+    def __len__(self):
+        return sum(len(layer) for layer in self.layers)
+
+    def begin(self, view):
+        self.view = view
+        for layer in self.layers:
+            layer.clear()
+
+    def submit(self, layer, image, rect):
+        view = self.view
+        if view.colliderect(rect):
+            self.layers[layer].append((image, (rect.x - view.x, rect.y - view.y)))
+
+    def submit_many(self, layer, sprites):
+        # sprites is an iterable of (image, world rect)
+        view = self.view
+        ox, oy = view.topleft
+        collide = view.colliderect
+        self.layers[layer].extend((image, (rect.x - ox, rect.y - oy))
+                                  for image, rect in sprites if collide(rect))
+
+    def visible(self, left, top, width, height):
+        # Mask of the rects, given as arrays, that overlap the view. For
+        # batches that cull themselves before building their image list.
+        view = self.view
+        return ((left + width > view.left) & (left < view.right) &
+                (top + height > view.top) & (top < view.bottom))
+
+    def submit_batch(self, layer, images, left, top):
+        # images and world top-left arrays of sprites already culled with visible()
+        ox, oy = self.view.topleft
+        self.layers[layer].extend(zip(images, zip((left - ox).tolist(), (top - oy).tolist())))
+
+    def flush(self, surface, start=0, stop=None):
+        # Draws layers start to stop (exclusive; None for the rest) in order
+        # and returns the rects drawn, for dirty-rect rendering
+        rects = []
+        for layer in self.layers[start:stop]:
+            if layer:
+                rects.extend(surface.blits(layer))
+        return rects
+
@@ -0,0 +1,70 @@
+# renderer.py
+import pygame
+
+import app
+
+
+# Owns clearing and presenting the screen. In full mode the whole background
+# is blitted and the display flipped every frame. In dirty-rect mode only the
+# regions sprites covered last frame are restored, and only those plus this
+# frame's sprite rects are pushed to the display, falling back to a full flip
+# once the dirty area passes a fraction of the screen.
+class ScreenRenderer:
+    def __init__(self, screen, background, dirty_rects=app.DIRTY_RECT_RENDERING,
+                 threshold=app.DIRTY_RECT_THRESHOLD):
+        self.screen = screen
+        self.background = background
+        self.dirty_rects = dirty_rects
+        self.threshold = threshold
+        self.screen_rect = screen.get_rect()
+        self.screen_area = self.screen_rect.width * self.screen_rect.height
+
+        self.previous = []
+        self.full_redraw = True
+        self.full_frames = 0
+        self.partial_frames = 0
+
+    def set_dirty_rects(self, enabled):
+        self.dirty_rects = enabled
+        self.invalidate()
+
+    def invalidate(self):
+        # Next frame redraws and presents the whole screen, e.g. after a menu
+        # overlay or a background change
+        self.full_redraw = True
+
+    def begin(self):
+        if not self.dirty_rects or self.full_redraw:
+            self.screen.blit(self.background, (0, 0))
+            return
+
+        blit = self.screen.blit
+        background = self.background
+        for rect in self.previous:
+            blit(background, rect, rect)
+
+    def present(self, rects):
+        if not self.dirty_rects:
+            pygame.display.flip()
+            return
+
+        clip = self.screen_rect.clip
+        current = []
+        area = 0
+        for rect in rects:
+            rect = clip(rect)
+            if rect.width and rect.height:
+                current.append(rect)
+                area += rect.width * rect.height
+        for rect in self.previous:
+            area += rect.width * rect.height
+
+        if self.full_redraw or area > self.threshold * self.screen_area:
+            pygame.display.flip()
+            self.full_frames += 1
+        else:
+            pygame.display.update(self.previous + current)
+            self.partial_frames += 1
+
+        self.previous = current
+        self.full_redraw = False
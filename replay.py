@@ -0,0 +1,153 @@
+# replay.py
+import json
+import struct
+import zlib
+
+import app
+from simulation import Simulation, TickInput, HeldKeys, MOVE_KEYS
+
+REPLAY_MAGIC = b"SHRP"
+REPLAY_VERSION = 4
+HEADER = struct.Struct("<4sHQI8s")  # magic, version, seed, tick count, definitions digest
+# held/flag bits, fire presses, upgrade index (-1 = none), aim x, y, enemy capacity (0 = unchanged)
+TICK = struct.Struct("<BBbiiH")
+RESTART_BIT = 1 << len(MOVE_KEYS)
+TRIGGER_BIT = RESTART_BIT << 1
+AIM_BIT = TRIGGER_BIT << 1
+
+# Constants that change how the simulation plays out. They are stored with the
+# replay so playback can tell when it no longer matches the recording.
+RECORDED_CONSTANTS = (
+    "WIDTH", "HEIGHT", "FPS", "PLAYER_SPEED", "DEFAULT_ENEMY_SPEED", "SPAWN_MARGIN",
+    "ENEMY_SCALE_FACTOR", "PLAYER_SCALE_FACTOR", "PUSHBACK_DISTANCE",
+    "ENEMY_KNOCKBACK_SPEED", "KNOCKBACK_RADIUS", "COLLISION_CELL_SIZE", "FLOW_FIELD_NEAR",
+    "ENEMY_SEPARATION", "SEPARATION_CELL_SIZE", "ENEMY_SPAWN_INTERVAL", "ENEMIES_PER_SPAWN",
+    "ENEMIES_PER_SPAWN_GROWTH", "LEVEL_XP_FACTOR", "UPGRADE_BULLET_SIZE", "UPGRADE_BULLET_SPEED",
+    "UPGRADE_BULLET_COUNT", "UPGRADE_COOLDOWN_FACTOR", "WORLD_WIDTH", "WORLD_HEIGHT",
+    "OFFSCREEN_UPDATE_INTERVAL", "LOD_MID_MARGIN", "LOD_FAR_INTERVAL", "LOD_AGGREGATE_MARGIN",
+    "LOD_RELEASE_MARGIN", "LOD_GROUP_SIZE", "COIN_CAP", "COIN_TTL", "COIN_MERGE_RADIUS", "COIN_SIZE", "COIN_MAX_SIZE",
+    "COIN_MAGNET_RADIUS", "COIN_MAGNET_SPEED", "POWERUP_CAP", "POWERUP_TTL", "FIRE_BUFFER_TICKS",
+    "DIRECTOR_CAPACITY", "DIRECTOR_MIN_CAPACITY", "DIRECTOR_MAX_CAPACITY", "DIRECTOR_SPAWNS_PER_TICK",
+    "PROMOTION_HP_FACTOR", "PROMOTION_SPEED_BONUS", "PROMOTION_MAX_TIER",
+)
+
+
+def capture_constants():
+    return {name: getattr(app, name) for name in RECORDED_CONSTANTS}
+
+
+def mismatches(constants, definitions):
+    # (name, then, now) for every recorded constant with a different value
+    # now, plus ("definitions", then, now) when the definitions file changed
+    current = capture_constants()
+    changed = [(name, value, current.get(name)) for name, value in constants.items() if current.get(name) != value]
+    if definitions != app.DEFINITIONS.digest:
+        changed.append(("definitions", definitions, app.DEFINITIONS.digest))
+    return changed
+
+
+def pack_tick(tick_input):
+    bits = 0
+    for i, key in enumerate(MOVE_KEYS):
+        if tick_input.held[key]:
+            bits |= 1 << i
+    if tick_input.restart:
+        bits |= RESTART_BIT
+    if tick_input.trigger:
+        bits |= TRIGGER_BIT
+    # Aim points are whole world pixels, as InputController produces them
+    aim_x = aim_y = 0
+    if tick_input.aim is not None:
+        bits |= AIM_BIT
+        aim_x, aim_y = tick_input.aim
+    upgrade = -1 if tick_input.upgrade is None else tick_input.upgrade
+    capacity = tick_input.capacity or 0
+    return TICK.pack(bits, min(tick_input.fire, 255), upgrade, aim_x, aim_y, capacity)
+
+
+def unpack_tick(bits, fire, upgrade, aim_x, aim_y, capacity):
+    held = HeldKeys(key for i, key in enumerate(MOVE_KEYS) if bits & (1 << i))
+    return TickInput(held, fire, None if upgrade < 0 else upgrade, bool(bits & RESTART_BIT),
+                     bool(bits & TRIGGER_BIT), (aim_x, aim_y) if bits & AIM_BIT else None, capacity or None)
+
+
+# Collects one packed TickInput per simulation tick. A session is the seed plus
+# a few bytes per tick, so even long runs stay small once compressed.
+class ReplayRecorder:
+    def __init__(self, seed):
+        self.seed = seed
+        self.constants = capture_constants()
+        self.definitions = app.DEFINITIONS.digest
+        self.ticks = bytearray()
+
+    @property
+    def tick_count(self):
+        return len(self.ticks) // TICK.size
+
+    def record(self, tick_input):
+        self.ticks += pack_tick(tick_input)
+
+    def save(self, path):
+        constants = json.dumps(self.constants, sort_keys=True).encode()
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, self.tick_count,
+                                bytes.fromhex(self.definitions)))
+            f.write(struct.pack("<I", len(constants)))
+            f.write(constants)
+            f.write(zlib.compress(bytes(self.ticks), 9))
+
+
+# A recorded session loaded back from disk
+class Replay:
+    def __init__(self, seed, constants, ticks, definitions=None):
+        self.seed = seed
+        self.constants = constants
+        self.ticks = ticks
+        self.definitions = definitions
+
+    def __len__(self):
+        return len(self.ticks) // TICK.size
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        magic, version, seed, tick_count, definitions = HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC:
+            raise ValueError(f"{path} is not a replay file")
+        if version != REPLAY_VERSION:
+            raise ValueError(f"{path} is replay version {version}, expected {REPLAY_VERSION}")
+
+        offset = HEADER.size
+        (length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        constants = json.loads(data[offset:offset + length])
+        ticks = zlib.decompress(data[offset + length:])
+        if len(ticks) != tick_count * TICK.size:
+            raise ValueError(f"{path} is truncated")
+        return cls(seed, constants, ticks, definitions.hex())
+
+    def mismatched_constants(self):
+        # (name, recorded, current) for every constant that changed since
+        # recording, and for the definitions if those did
+        return mismatches(self.constants, self.definitions)
+
+    def inputs(self):
+        for fields in TICK.iter_unpack(self.ticks):
+            yield unpack_tick(*fields)
+
+
+def play_headless(replay, profiler=None):
+    # Fast-forward a replay with no window, audio or frame cap. With a
+    # profiler, every tick is recorded as one frame so slow ticks can be
+    # found by index.
+    assets = app.load_assets(headless=True)
+    sim = Simulation(assets, seed=replay.seed, profiler=profiler)
+    for tick_input in replay.inputs():
+        if profiler:
+            profiler.begin_frame()
+        sim.advance(tick_input)
+        if profiler:
+            profiler.end_frame(enemies=len(sim.enemies), bullets=len(sim.player.bullets))
+    return sim
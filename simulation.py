@@ -0,0 +1,386 @@
+# simulation.py
+import itertools
+import random
+
+import pygame
+
+import app
+from camera import Camera, world_center
+from coin import Coin
+from director import SpawnDirector, promoted_stats
+from player import Player
+from enemy import EnemyPool
+import events
+from events import EventBus
+from flowfield import FlowField
+from lifecycle import EntityLifecycle
+from lod import LODScheduler
+from powerup import PowerUp
+from spatial import SpatialHash
+from profiler import NullProfiler
+
+
+# Key state for ticks that are not driven by the real keyboard. Indexable by
+# pygame key constants, like the sequence pygame.key.get_pressed() returns.
+class HeldKeys:
+    def __init__(self, keys=()):
+        self.keys = frozenset(keys)
+
+    def __getitem__(self, key):
+        return key in self.keys
+
+
+NO_KEYS = HeldKeys()
+
+MOVE_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN)
+
+
+# Everything the player did for one tick: the movement keys and fire button
+# held, where they aim (a world position, or None to shoot at the nearest
+# enemies), plus the discrete presses (shots, upgrade pick, restart) that
+# arrived since the previous tick. capacity carries a new enemy capacity
+# from the game's frame budget (None leaves it as it is). Feeding the same
+# TickInputs to a Simulation with the same seed reproduces the same game.
+class TickInput:
+    __slots__ = ("held", "trigger", "aim", "fire", "upgrade", "restart", "capacity")
+
+    def __init__(self, held=NO_KEYS, fire=0, upgrade=None, restart=False, trigger=False, aim=None,
+                 capacity=None):
+        self.held = held
+        self.trigger = trigger
+        self.aim = aim
+        self.fire = fire
+        self.upgrade = upgrade
+        self.restart = restart
+        self.capacity = capacity
+
+
+# The game rules with no display, audio or clock attached. Every call to
+# step() advances the world by exactly one fixed tick of dt seconds, so it can
+# be driven by the renderer at app.FPS or as fast as the CPU allows.
+class Simulation:
+    def __init__(self, assets, seed=None, profiler=None):
+        self.assets = assets
+        self.definitions = assets["definitions"]
+        self.profiler = profiler or NullProfiler()
+        # Always run from a known seed so any session can be replayed
+        if seed is None:
+            seed = random.randrange(2**63)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.dt = 1 / app.FPS
+        self.tick = 0
+
+        self.enemies = EnemyPool(assets["enemies"], assets["atlas"])
+        self.enemy_spawn_interval = app.ENEMY_SPAWN_INTERVAL
+
+        self.powerup_spawn_timer = 0
+        self.powerup_spawn_interval = 300
+
+        self.enemy_grid = SpatialHash()
+        # Pickups are capped, expire and are indexed for collision and drawing
+        self.coins = EntityLifecycle(app.COIN_CAP, app.COIN_TTL)
+        self.powerups = EntityLifecycle(app.POWERUP_CAP, app.POWERUP_TTL)
+
+        # Pathing grid laid over the floor tiles the background is built from
+        tile_size = assets["floor_tiles"][0].get_width()
+        self.flow = FlowField(app.WIDTH, app.HEIGHT, tile_size)
+
+        # The view the player sees. Spawning and update rates depend on it, so
+        # it is part of the simulation rather than the renderer.
+        self.camera = Camera()
+        # Decides how often each enemy is simulated, and holds the far away
+        # ones as groups
+        self.lod = LODScheduler(self.camera, self.rng)
+        # Keeps the enemy count within what the machine can afford
+        self.director = SpawnDirector(app.DIRECTOR_CAPACITY)
+
+        # Collisions publish here; damage, loot and XP are applied by the
+        # subscribers in a batch at the end of the tick
+        self.events = EventBus()
+        self.events.subscribe(events.PLAYER_HIT, self.on_player_hit)
+        self.events.subscribe(events.ENEMY_KILLED, self.on_enemy_killed)
+        self.events.subscribe(events.PICKUP, self.on_pickup)
+
+        self.reset()
+
+    def reset(self):
+        self.player = Player(*world_center(), self.assets)
+        self.camera.follow(self.player.x, self.player.y)
+        self.enemies.clear()
+        self.lod.clear()
+        self.director.clear()
+        self.enemy_spawn_timer = 0
+        self.enemies_per_spawn = app.ENEMIES_PER_SPAWN
+        # Ticks a fire press stays buffered, waiting for the cooldown
+        self.fire_buffer = 0
+
+        self.game_over = False
+        self.in_level_up_menu = False
+        self.upgrade_options = []
+
+        self.enemy_grid.clear()
+        self.coins.clear()
+        self.powerups.clear()
+        self.events.clear()
+
+    def advance(self, tick_input):
+        # One fixed tick driven by recorded or live input. Presses are applied
+        # first, then the world steps (unless a menu has it paused). Shots
+        # wait for the player's cooldown, so any number of presses in one
+        # tick buffer a single shot.
+        if tick_input.restart:
+            self.reset()
+        if tick_input.capacity is not None:
+            self.director.set_capacity(tick_input.capacity)
+        if tick_input.upgrade is not None:
+            self.choose_upgrade(tick_input.upgrade)
+        if tick_input.fire and not (self.game_over or self.in_level_up_menu):
+            self.fire_buffer = app.FIRE_BUFFER_TICKS
+        self.step(tick_input.held, tick_input.trigger, tick_input.aim)
+
+    def step(self, keys=None, trigger=False, aim=None):
+        # The world is frozen while the game over or upgrade screens are up
+        if self.game_over or self.in_level_up_menu:
+            return
+        self.tick += 1
+        self.update(NO_KEYS if keys is None else keys, trigger, aim)
+        with self.profiler.stage("dispatch"):
+            self.events.dispatch()
+
+    def update(self, keys, trigger=False, aim=None):
+        stage = self.profiler.stage
+        with stage("input"):
+            self.player.handle_input(keys)
+            self.fire(trigger, aim)
+        with stage("player"):
+            self.player.update(self.camera.rect)
+            self.camera.follow(self.player.x, self.player.y)
+
+        px, py = self.player.x, self.player.y
+        with stage("flow_field"):
+            self.flow.update(px, py)
+        with stage("lod"):
+            self.lod.update(self.enemies, px, py, self.tick)
+            ticks, animate = self.lod.schedule(self.enemies, self.tick)
+        with stage("enemies"):
+            self.enemies.update(px, py, self.flow, ticks, animate)
+
+        # Enemies all move every tick, so the broadphase is rebuilt rather than
+        # patched. Bullets die at the view's edge and the player is inside it,
+        # so only enemies near the view can collide with anything.
+        with stage("broadphase"):
+            self.rebuild_enemy_grid()
+
+        with stage("player_hits"):
+            self.check_player_enemy_collisions()
+        with stage("bullet_hits"):
+            self.check_bullet_enemy_collisions()
+        with stage("coin_pickup"):
+            self.attract_coins()
+            self.check_player_coin_collisions()
+
+        with stage("spawn"):
+            self.spawn_enemies()
+            self.place_spawns()
+        self.check_for_level_up()
+
+        with stage("powerups"):
+            self.spawn_powerups()
+            self.check_player_powerup_collisions()
+
+        with stage("lifecycle"):
+            self.coins.expire(self.tick)
+            self.powerups.expire(self.tick)
+
+    def rebuild_enemy_grid(self):
+        near = self.enemies.inside(self.camera.rect, app.COLLISION_CELL_SIZE)
+        left, top, width, height = self.enemies.bounds()
+        self.enemy_grid.rebuild_bounds(list(itertools.compress(self.enemies.views, near.tolist())),
+                                       left[near], top[near], width[near], height[near])
+
+    def fire(self, trigger, aim=None):
+        # A held trigger fires every time the cooldown allows; a press fires
+        # as soon as it allows, if that is within FIRE_BUFFER_TICKS
+        if (trigger or self.fire_buffer > 0) and self.player.can_shoot() and self.shoot(aim):
+            self.fire_buffer = 0
+        elif self.fire_buffer > 0:
+            self.fire_buffer -= 1
+
+    def shoot(self, aim=None):
+        # True if a volley was fired. Without an aim point, multi-bullet
+        # volleys pick one target per bullet.
+        if self.game_over or self.in_level_up_menu:
+            return False
+        if aim is not None:
+            fired = self.player.shoot_toward_mouse(aim)
+        else:
+            targets = self.find_nearest_enemies(self.player.bullet_count)
+            fired = bool(targets) and self.player.shoot_toward_enemies(targets)
+        if fired:
+            self.events.publish(events.SHOT_FIRED, self.player.x, self.player.y)
+        return fired
+
+    def choose_upgrade(self, index):
+        if not self.in_level_up_menu:
+            return
+        if 0 <= index < len(self.upgrade_options):
+            upgrade = self.upgrade_options[index]
+            self.player.apply_upgrade(self.player, upgrade)  # Use apply_upgrade
+            self.in_level_up_menu = False
+
+    def live_enemies(self):
+        return len(self.enemies) + len(self.lod)
+
+    def spawn_enemies(self):
+        self.enemy_spawn_timer += 1
+        if self.enemy_spawn_timer >= self.enemy_spawn_interval:
+            self.enemy_spawn_timer = 0
+
+            # Just outside the camera view
+            view = self.camera.rect
+            for tier in self.director.plan(self.enemies_per_spawn, self.live_enemies()):
+                side = self.rng.choice(["top", "bottom", "left", "right"])
+                if side == "top":
+                    x = self.rng.randint(view.left, view.right)
+                    y = view.top - app.SPAWN_MARGIN
+                elif side == "bottom":
+                    x = self.rng.randint(view.left, view.right)
+                    y = view.bottom + app.SPAWN_MARGIN
+                elif side == "left":
+                    x = view.left - app.SPAWN_MARGIN
+                    y = self.rng.randint(view.top, view.bottom)
+                else:
+                    x = view.right + app.SPAWN_MARGIN
+                    y = self.rng.randint(view.top, view.bottom)
+
+                self.director.push(x, y, self.rng.choice(self.definitions.enemy_names), tier)
+
+    def place_spawns(self):
+        for x, y, enemy_type, tier in self.director.take():
+            self.place_enemy(x, y, enemy_type, tier)
+
+    def place_enemy(self, x, y, enemy_type, tier=0):
+        # Enemies out of range are handed to the LOD scheduler's groups
+        speed, hp = promoted_stats(self.definitions.enemies[enemy_type], tier)
+        if self.lod.in_range(x, y):
+            enemy = self.enemies.spawn(x, y, enemy_type, speed, hp)
+            self.enemy_grid.insert(enemy)
+        else:
+            self.lod.hold(x, y, enemy_type, speed, hp)
+
+    def check_player_enemy_collisions(self):
+        # One hit per tick however many enemies are touching
+        touching = self.enemy_grid.collide(self.player.rect)
+        if touching:
+            self.events.publish(events.PLAYER_HIT, self.player.x, self.player.y, touching)
+
+    def on_player_hit(self, hits):
+        self.player.take_damage(len(hits))
+        # Only enemies near the player are shoved back
+        self.enemies.set_knockback(self.player.x, self.player.y, app.PUSHBACK_DISTANCE,
+                                   app.KNOCKBACK_RADIUS)
+        if self.player.health <= 0:
+            self.game_over = True
+
+    def find_nearest_enemy(self):
+        nearest = self.find_nearest_enemies(1)
+        return nearest[0] if nearest else None
+
+    def find_nearest_enemies(self, k, max_radius=None):
+        # Straight from the pool's position arrays: one vectorised distance
+        # pass beats walking the grid's rings cell by cell
+        return self.enemies.nearest(self.player.x, self.player.y, k, max_radius)
+
+    def check_bullet_enemy_collisions(self):
+        spent_bullets = set()
+        for bullet in self.player.bullets:
+            for enemy in self.enemy_grid.collide(bullet.rect):
+                spent_bullets.add(bullet)
+                # Each bullet takes one hit point
+                enemy.hp -= 1
+                if enemy.hp > 0:
+                    break
+                self.enemy_grid.remove(enemy)
+                self.events.publish(events.ENEMY_KILLED, enemy.x, enemy.y, enemy.enemy_type)
+                self.enemies.remove(enemy)  # swap-remove, O(1)
+                break
+
+        # Recycle spent bullets once at the end instead of list.remove() while iterating
+        self.player.bullets.release_many(spent_bullets)
+
+    def attract_coins(self):
+        # Coins within the player's magnet radius fly towards them
+        radius = self.player.magnet_radius
+        if radius <= 0:
+            return
+        for coin in self.coins.within_radius(self.player.x, self.player.y, radius):
+            coin.move_toward(self.player.x, self.player.y, app.COIN_MAGNET_SPEED)
+            self.coins.moved(coin)
+
+    def check_player_coin_collisions(self):
+        for coin in self.coins.collide(self.player.rect):
+            self.coins.remove(coin)
+            self.events.publish(events.PICKUP, coin.x, coin.y, coin)
+
+    def on_enemy_killed(self, kills):
+        # Every kill drops a coin where the enemy died, or adds to a coin
+        # already lying close by
+        for kill in kills:
+            coin = self.coins.nearest(kill.x, kill.y, app.COIN_MERGE_RADIUS)
+            if coin is not None:
+                coin.add_value(1)
+                self.coins.refresh(coin, self.tick)
+            else:
+                self.coins.add(Coin(kill.x, kill.y), self.tick)
+
+    def on_pickup(self, pickups):
+        for pickup in pickups:
+            if isinstance(pickup.subject, PowerUp):
+                pickup.subject.apply_effect(self.player)
+            else:
+                self.player.add_xp(pickup.subject.value)
+
+    def check_for_level_up(self):
+        if self.game_over:
+            return
+        if self.player.xp >= self.player.xp_for_next_level():
+            # Leveled up
+            self.player.level += 1
+            self.in_level_up_menu = True
+            self.upgrade_options = self.player.pick_random_upgrades(3, self.rng)  # Use pick_random_upgrades
+            self.enemies_per_spawn += app.ENEMIES_PER_SPAWN_GROWTH
+            self.events.publish(events.LEVEL_UP, self.player.x, self.player.y, self.player.level)
+
+    def spawn_powerups(self):
+        self.powerup_spawn_timer += 1
+        if self.powerup_spawn_timer >= self.powerup_spawn_interval:
+            self.powerup_spawn_timer = 0
+            # Somewhere the player can see it
+            view = self.camera.rect
+            x = self.rng.randint(view.left, view.right)
+            y = self.rng.randint(view.top, view.bottom)
+            powerup_type = self.rng.choice(self.definitions.powerup_names)
+            powerup = PowerUp(x, y, powerup_type, self.assets)  # Pass assets
+            self.powerups.add(powerup, self.tick)
+
+    def check_player_powerup_collisions(self):
+        for powerup in self.powerups.collide(self.player.rect):
+            self.powerups.remove(powerup)
+            self.events.publish(events.PICKUP, powerup.rect.centerx, powerup.rect.centery, powerup)
+
+
+def run_headless(ticks, seed=None, snapshot=None):
+    # Balancing/soak entry point: no window, no audio, no frame cap. With a
+    # snapshot, the run carries on from the saved state.
+    assets = app.load_assets(headless=True)
+    sim = Simulation(assets, seed=seed)
+    if snapshot:
+        snapshot.restore(sim)
+    for _ in range(ticks):
+        if sim.game_over:
+            break
+        if sim.in_level_up_menu:
+            sim.choose_upgrade(0)
+        sim.step()
+    return sim
@@ -0,0 +1,273 @@
+# snapshot.py
+import concurrent.futures
+import json
+import os
+import random
+import struct
+import zlib
+
+import numpy as np
+
+import app
+from coin import Coin
+from enemy import EnemyPool
+from lod import EnemyGroup
+from powerup import PowerUp
+from replay import capture_constants, mismatches
+
+SNAPSHOT_MAGIC = b"SHSN"
+SNAPSHOT_VERSION = 5
+HEADER = struct.Struct("<4sHI")  # magic, version, state (JSON) length
+
+# Player attributes saved as they are; image and rect are rebuilt from them
+PLAYER_FIELDS = (
+    "x", "y", "state", "frame_index", "animation_timer", "facing_left",
+    "xp", "level", "health", "max_health", "shield_timer", "speed",
+    "bullet_speed", "bullet_size", "bullet_count", "shoot_cooldown", "shoot_timer", "magnet_radius",
+)
+
+# Simulation counters saved as they are
+SIM_FIELDS = (
+    "seed", "tick", "enemy_spawn_timer", "enemy_spawn_interval", "enemies_per_spawn",
+    "fire_buffer", "powerup_spawn_timer", "powerup_spawn_interval", "game_over", "in_level_up_menu",
+)
+
+# Everything else in the JSON state
+STATE_FIELDS = SIM_FIELDS + (
+    "rng", "upgrade_options", "player", "groups", "capacity", "spawn_queue", "powerup_types",
+    "constants", "definitions",
+)
+
+# Raw arrays by the entities they describe; each entity's arrays are the same length
+ARRAYS = (
+    tuple("enemy_" + name for name, _ in EnemyPool.FIELDS),
+    ("bullet_x", "bullet_y", "bullet_vx", "bullet_vy", "bullet_size"),
+    ("coin_x", "coin_y", "coin_value", "coin_expiry"),
+    ("powerup_x", "powerup_y", "powerup_expiry"),
+)
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+# Everything a Simulation needs to carry on exactly where it was saved. The
+# file is a small header, then (zlib compressed) a JSON block with the scalar
+# state followed by the raw bytes of every array it lists, so thousands of
+# enemies are stored and restored as a few array copies.
+class Snapshot:
+    def __init__(self, state, arrays):
+        self.state = state
+        self.arrays = arrays
+
+    @classmethod
+    def capture(cls, sim):
+        # Copies everything out of sim, so the simulation can keep running
+        # while the copy is written elsewhere
+        player = sim.player
+        state = {name: getattr(sim, name) for name in SIM_FIELDS}
+        version, internal, gauss = sim.rng.getstate()
+        state["rng"] = [version, list(internal), gauss]
+        state["upgrade_options"] = [upgrade.name for upgrade in sim.upgrade_options]
+        state["player"] = {name: getattr(player, name) for name in PLAYER_FIELDS}
+        state["groups"] = [[group.x, group.y, list(group.types), list(group.speeds), list(group.hps)]
+                           for group in sim.lod.groups]
+        state["capacity"] = sim.director.capacity
+        state["spawn_queue"] = [list(spawn) for spawn in sim.director.queue]
+        state["powerup_types"] = [powerup.powerup_type for powerup in sim.powerups]
+        state["constants"] = capture_constants()
+        state["definitions"] = sim.definitions.digest
+
+        arrays = {}
+        n = len(sim.enemies)
+        for name, _ in sim.enemies.FIELDS:
+            arrays["enemy_" + name] = getattr(sim.enemies, name)[:n].copy()
+
+        bullets = player.bullets.active
+        for name in ("x", "y", "vx", "vy"):
+            arrays["bullet_" + name] = np.array([getattr(b, name) for b in bullets], dtype=np.float64)
+        arrays["bullet_size"] = np.array([b.size for b in bullets], dtype=np.int32)
+
+        coins = list(sim.coins)
+        arrays["coin_x"] = np.array([coin.x for coin in coins], dtype=np.float64)
+        arrays["coin_y"] = np.array([coin.y for coin in coins], dtype=np.float64)
+        arrays["coin_value"] = np.array([coin.value for coin in coins], dtype=np.int32)
+        arrays["coin_expiry"] = expiry_array(sim.coins)
+
+        powerups = list(sim.powerups)
+        arrays["powerup_x"] = np.array([p.x for p in powerups], dtype=np.float64)
+        arrays["powerup_y"] = np.array([p.y for p in powerups], dtype=np.float64)
+        arrays["powerup_expiry"] = expiry_array(sim.powerups)
+        return cls(state, arrays)
+
+    def to_bytes(self):
+        state = dict(self.state)
+        state["arrays"] = [[name, array.dtype.str, len(array)] for name, array in self.arrays.items()]
+        encoded = json.dumps(state).encode()
+        body = zlib.compress(encoded + b"".join(array.tobytes() for array in self.arrays.values()), 1)
+        return HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(encoded)) + body
+
+    @classmethod
+    def from_bytes(cls, data, path="snapshot"):
+        try:
+            magic, version, length = HEADER.unpack_from(data)
+            if magic != SNAPSHOT_MAGIC:
+                raise SnapshotError(f"{path} is not a snapshot file")
+            if version != SNAPSHOT_VERSION:
+                raise SnapshotError(f"{path} is snapshot version {version}, expected {SNAPSHOT_VERSION}")
+            body = zlib.decompress(data[HEADER.size:])
+            state = json.loads(body[:length])
+            if not isinstance(state, dict):
+                raise SnapshotError(f"{path} is corrupt: the state is not an object")
+
+            arrays = {}
+            offset = length
+            for name, dtype, count in state.pop("arrays"):
+                array = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+                arrays[name] = array
+                offset += array.nbytes
+        except SnapshotError:
+            raise
+        except (struct.error, zlib.error, KeyError, TypeError, ValueError) as e:
+            raise SnapshotError(f"{path} is corrupt: {e}") from e
+        if offset != len(body):
+            raise SnapshotError(f"{path} is truncated")
+        return cls(state, arrays)
+
+    def save(self, path):
+        # Written to a temporary file first so a crash never leaves half a snapshot
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(temp, path)
+        return path
+
+    @classmethod
+    def load(cls, path, definitions=app.DEFINITIONS):
+        # Raises SnapshotError for anything that can't be restored, so a bad
+        # file is refused before the running game is touched
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            raise SnapshotError(str(e)) from e
+        snapshot = cls.from_bytes(data, path)
+        snapshot.check(definitions, path)
+        return snapshot
+
+    def check(self, definitions, path="snapshot"):
+        # Every key, length and name restore() relies on
+        state = self.state
+        arrays = self.arrays
+        missing = [name for name in STATE_FIELDS if name not in state]
+        missing += [name for names in ARRAYS for name in names if name not in arrays]
+        if missing:
+            raise SnapshotError(f"{path} is missing {', '.join(missing)}")
+        try:
+            missing = [name for name in PLAYER_FIELDS if name not in state["player"]]
+            if missing:
+                raise SnapshotError(f"{path} is missing player {', '.join(missing)}")
+            for names in ARRAYS:
+                if len({len(arrays[name]) for name in names}) != 1:
+                    entity = names[0].split("_")[0]
+                    raise SnapshotError(f"{path} has {entity} arrays of different lengths")
+            if len(state["powerup_types"]) != len(arrays["powerup_x"]):
+                raise SnapshotError(f"{path} has {len(state['powerup_types'])} power-up types "
+                                    f"for {len(arrays['powerup_x'])} power-ups")
+            for x, y, types, speeds, hps in state["groups"]:
+                if not len(types) == len(speeds) == len(hps):
+                    raise SnapshotError(f"{path} has an enemy group with missing members")
+
+            unknown = [name for name in state["upgrade_options"] if name not in definitions.upgrades]
+            unknown += [name for name in state["powerup_types"] if name not in definitions.powerups]
+            unknown += [name for group in state["groups"] for name in group[2] if name not in definitions.enemies]
+            unknown += [spawn[2] for spawn in state["spawn_queue"] if spawn[2] not in definitions.enemies]
+            if unknown:
+                raise SnapshotError(f"{path} names unknown {', '.join(map(repr, unknown))}")
+            type_ids = arrays["enemy_type_id"]
+            if len(type_ids) and not (type_ids.min() >= 0 and type_ids.max() < len(definitions.enemy_names)):
+                raise SnapshotError(f"{path} has unknown enemy types")
+
+            player = state["player"]
+            sheet = app.ATLAS_SHEETS.get(f"player_{player['state']}")
+            if sheet is None or not 0 <= player["frame_index"] < sheet[1]:
+                raise SnapshotError(f"{path} has no player frame {player['state']!r} {player['frame_index']!r}")
+            version, internal, gauss = state["rng"]
+            random.Random().setstate((version, tuple(internal), gauss))
+        except SnapshotError:
+            raise
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise SnapshotError(f"{path} is corrupt: {e}") from e
+
+    def mismatched_constants(self):
+        # (name, saved, current) for every constant that changed since
+        # saving, and for the definitions if those did
+        return mismatches(self.state["constants"], self.state["definitions"])
+
+    def restore(self, sim):
+        # A loaded snapshot has been checked, so nothing below can fail
+        # halfway through
+        state = self.state
+        arrays = self.arrays
+        sim.reset()
+        for name in SIM_FIELDS:
+            setattr(sim, name, state[name])
+        version, internal, gauss = state["rng"]
+        sim.rng.setstate((version, tuple(internal), gauss))
+        upgrades = sim.definitions.upgrades
+        sim.upgrade_options = [upgrades[name] for name in state["upgrade_options"]]
+
+        player = sim.player
+        for name in PLAYER_FIELDS:
+            setattr(player, name, state["player"][name])
+        player.image = player.animations[player.state][player.frame_index]
+        player.rect = player.image.get_rect(center=(player.x, player.y))
+        for x, y, vx, vy, size in zip(arrays["bullet_x"].tolist(), arrays["bullet_y"].tolist(),
+                                      arrays["bullet_vx"].tolist(), arrays["bullet_vy"].tolist(),
+                                      arrays["bullet_size"].tolist()):
+            player.bullets.spawn(x, y, vx, vy, size)
+
+        sim.enemies.restore({name: arrays["enemy_" + name] for name, _ in sim.enemies.FIELDS})
+        for x, y, types, speeds, hps in state["groups"]:
+            group = EnemyGroup(x, y)
+            for enemy_type, speed, hp in zip(types, speeds, hps):
+                group.add(enemy_type, speed, hp)
+            sim.lod.groups.append(group)
+        sim.director.capacity = state["capacity"]
+        sim.director.queue.extend(tuple(spawn) for spawn in state["spawn_queue"])
+
+        for x, y, value, expiry in zip(arrays["coin_x"].tolist(), arrays["coin_y"].tolist(),
+                                       arrays["coin_value"].tolist(), arrays["coin_expiry"].tolist()):
+            sim.coins.restore(Coin(x, y, value), None if expiry < 0 else expiry)
+        for x, y, powerup_type, expiry in zip(arrays["powerup_x"].tolist(), arrays["powerup_y"].tolist(),
+                                              state["powerup_types"], arrays["powerup_expiry"].tolist()):
+            sim.powerups.restore(PowerUp(x, y, powerup_type, sim.assets), None if expiry < 0 else expiry)
+
+        # Derived state is rebuilt rather than saved
+        sim.camera.follow(player.x, player.y)
+        sim.flow.center = None
+        sim.rebuild_enemy_grid()
+        return sim
+
+
+def expiry_array(lifecycle):
+    # Expiry ticks in age order, -1 for entities that never expire
+    return np.array([-1 if ends is None else ends for ends in lifecycle.expiry.values()], dtype=np.int64)
+
+
+# Saves snapshots without stalling the frame: the state is copied on the
+# calling thread, then compressed and written on a background one
+class SnapshotWriter:
+    def __init__(self):
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def save(self, sim, path):
+        # Returns a future that resolves to the path once it is on disk
+        return self.pool.submit(Snapshot.capture(sim).save, path)
+
+    def close(self):
+        # Waits for any snapshot still being written
+        self.pool.shutdown(wait=True)
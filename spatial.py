@@ -0,0 +1,198 @@
+# spatial.py
+import heapq
+
+import app
+
+
+# Uniform grid broadphase. Items are bucketed by the cells their rect covers,
+# so a query only has to look at the handful of items sharing those cells.
+# Nearest-neighbour queries search outward ring by ring from the query point
+# and use each item's x/y as its position.
+class SpatialHash:
+    def __init__(self, cell_size=app.COLLISION_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.item_cells = {}
+        # Cell extent ever covered since the last clear, bounds ring searches
+        self.extent = None
+
+    def __len__(self):
+        return len(self.item_cells)
+
+    def clear(self):
+        self.cells.clear()
+        self.item_cells.clear()
+        self.extent = None
+
+    def grow_extent(self, x0, y0, x1, y1):
+        if self.extent is None:
+            self.extent = [x0, y0, x1, y1]
+        else:
+            extent = self.extent
+            extent[0] = min(extent[0], x0)
+            extent[1] = min(extent[1], y0)
+            extent[2] = max(extent[2], x1)
+            extent[3] = max(extent[3], y1)
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def insert(self, item, rect=None):
+        if rect is None:
+            rect = item.rect
+        span = self.cell_range(rect)
+        x0, y0, x1, y1 = span
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket is None:
+                    self.cells[(cx, cy)] = [item]
+                else:
+                    bucket.append(item)
+        self.item_cells[item] = span
+        self.grow_extent(*span)
+
+    def remove(self, item):
+        span = self.item_cells.pop(item, None)
+        if span is None:
+            return
+        x0, y0, x1, y1 = span
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                bucket = self.cells[(cx, cy)]
+                bucket.remove(item)
+                if not bucket:
+                    del self.cells[(cx, cy)]
+
+    def update(self, item, rect=None):
+        # Only touch the buckets when the item actually crossed into new cells
+        if rect is None:
+            rect = item.rect
+        if self.item_cells.get(item) == self.cell_range(rect):
+            return
+        self.remove(item)
+        self.insert(item, rect)
+
+    def rebuild_bounds(self, items, left, top, width, height):
+        # Bulk rebuild from NumPy arrays of rect bounds (one entry per item),
+        # so the cell maths runs vectorized instead of per item.rect
+        self.clear()
+        if len(items) == 0:
+            return
+        size = self.cell_size
+        x0 = left // size
+        y0 = top // size
+        x1 = (left + width - 1) // size
+        y1 = (top + height - 1) // size
+        self.extent = [int(x0.min()), int(y0.min()), int(x1.max()), int(y1.max())]
+
+        cells = self.cells
+        item_cells = self.item_cells
+        for item, span in zip(items, zip(x0.tolist(), y0.tolist(), x1.tolist(), y1.tolist())):
+            item_cells[item] = span
+            ax, ay, bx, by = span
+            if ax == bx and ay == by:
+                bucket = cells.get((ax, ay))
+                if bucket is None:
+                    cells[(ax, ay)] = [item]
+                else:
+                    bucket.append(item)
+                continue
+            for cy in range(ay, by + 1):
+                for cx in range(ax, bx + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket is None:
+                        cells[(cx, cy)] = [item]
+                    else:
+                        bucket.append(item)
+
+    def query(self, rect):
+        # Every item sharing a cell with rect, in insertion order, without duplicates
+        x0, y0, x1, y1 = self.cell_range(rect)
+        if x0 == x1 and y0 == y1:
+            return list(self.cells.get((x0, y0), ()))
+
+        found = {}
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                for item in self.cells.get((cx, cy), ()):
+                    found[item] = None
+        return list(found)
+
+    def collide(self, rect):
+        return [item for item in self.query(rect) if item.rect.colliderect(rect)]
+
+    def ring_cells(self, cx, cy, ring):
+        if ring == 0:
+            yield (cx, cy)
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield (x, cy - ring)
+            yield (x, cy + ring)
+        for y in range(cy - ring + 1, cy + ring):
+            yield (cx - ring, y)
+            yield (cx + ring, y)
+
+    def nearest(self, x, y, k=1, max_radius=None):
+        # The k items closest to (x, y), closest first. Rings of cells are
+        # searched outward until nothing unseen could still be closer.
+        if self.extent is None or k <= 0:
+            return []
+        size = self.cell_size
+        cx = int(x // size)
+        cy = int(y // size)
+        ex0, ey0, ex1, ey1 = self.extent
+        last_ring = max(cx - ex0, ex1 - cx, cy - ey0, ey1 - cy, 0)
+        if max_radius is not None:
+            last_ring = min(last_ring, int(max_radius // size) + 1)
+            max_dist_sq = max_radius * max_radius
+
+        # The best k so far as a max-heap on (distance, order seen), so each
+        # candidate costs one comparison and at most one heap replace
+        seen = set()
+        best = []
+        for ring in range(last_ring + 1):
+            for cell in self.ring_cells(cx, cy, ring):
+                for item in self.cells.get(cell, ()):
+                    if item in seen:
+                        continue
+                    seen.add(item)
+                    dx = item.x - x
+                    dy = item.y - y
+                    dist_sq = dx * dx + dy * dy
+                    if max_radius is not None and dist_sq > max_dist_sq:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist_sq, -len(seen), item))
+                    elif dist_sq < -best[0][0]:
+                        heapq.heapreplace(best, (-dist_sq, -len(seen), item))
+
+            # Anything not reached yet is at least ring * size away
+            if len(best) >= k:
+                reach = ring * size
+                if -best[0][0] <= reach * reach:
+                    break
+
+        best.sort(reverse=True)
+        return [item for _, _, item in best]
+
+    def within_radius(self, x, y, radius):
+        size = self.cell_size
+        x0 = int((x - radius) // size)
+        y0 = int((y - radius) // size)
+        x1 = int((x + radius) // size)
+        y1 = int((y + radius) // size)
+        radius_sq = radius * radius
+
+        found = {}
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                for item in self.cells.get((cx, cy), ()):
+                    if item in found:
+                        continue
+                    dx = item.x - x
+                    dy = item.y - y
+                    found[item] = dx * dx + dy * dy <= radius_sq
+        return [item for item, inside in found.items() if inside]
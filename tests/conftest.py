@@ -0,0 +1,19 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# The game runs from the repository root, where its assets live, and needs no
+# window or sound card to simulate
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+@pytest.fixture(scope="session")
+def assets():
+    import app
+    return app.load_assets(headless=True)
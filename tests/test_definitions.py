@@ -0,0 +1,69 @@
+# tests/test_definitions.py
+import json
+import types
+
+import pytest
+
+import app
+from definitions import DefinitionError, compile_definitions
+
+
+class FakePlayer:
+    def __init__(self):
+        self.health = 5
+        self.max_health = 5
+        self.speed = 5
+        self.bullet_count = 1
+        self.shoot_cooldown = 20
+
+
+def load_data():
+    with open(app.DEFINITIONS_PATH) as f:
+        return json.load(f)
+
+
+def with_upgrade_effects(*effects):
+    data = load_data()
+    data["upgrades"].append({"name": "Test", "desc": "Test", "effects": list(effects)})
+    return data
+
+
+def test_shipped_definitions_compile():
+    compile_definitions(load_data(), app)
+
+
+@pytest.mark.parametrize("effect", [
+    {"stat": "bullet_count", "op": "add", "value": 1.5},
+    {"stat": "health", "op": "set", "value": 2.5},
+    {"stat": "health", "op": "add", "value": "UPGRADE_COOLDOWN_FACTOR"},
+    {"stat": "shoot_cooldown", "op": "mul", "value": 0.5, "min": 1.5},
+    {"stat": "health", "op": "add", "value": 1, "max": "speed"},
+])
+def test_fractional_changes_to_whole_number_stats_are_rejected(effect):
+    with pytest.raises(DefinitionError):
+        compile_definitions(with_upgrade_effects(effect), app)
+
+
+def test_whole_number_stats_stay_whole():
+    data = with_upgrade_effects({"stat": "bullet_count", "op": "mul", "value": 1.5},
+                                {"stat": "health", "op": "add", "value": 2.0},
+                                {"stat": "speed", "op": "mul", "value": 1.5})
+    upgrade = compile_definitions(data, app).upgrades["Test"]
+    player = FakePlayer()
+    player.bullet_count = 2
+    upgrade.apply(player)
+    upgrade.apply(player)
+    assert player.bullet_count == 4 and type(player.bullet_count) is int
+    assert player.health == 9 and type(player.health) is int
+    # Other stats may still be fractional
+    assert player.speed == 11.25
+
+
+def test_constants_tuned_to_fractions_are_truncated():
+    data = with_upgrade_effects({"stat": "bullet_count", "op": "add", "value": "UPGRADE_BULLET_COUNT"})
+    constants = types.SimpleNamespace(**{name: getattr(app, name) for name in dir(app) if name.isupper()})
+    upgrade = compile_definitions(data, constants).upgrades["Test"]
+    constants.UPGRADE_BULLET_COUNT = 1.5
+    player = FakePlayer()
+    upgrade.apply(player)
+    assert player.bullet_count == 2 and type(player.bullet_count) is int
@@ -0,0 +1,46 @@
+# tests/test_lod.py
+import math
+import random
+
+import numpy as np
+
+import app
+from camera import Camera, world_center
+from enemy import EnemyPool
+from lod import LODScheduler
+
+
+def spawn_ring(pool, cx, cy, radius, count):
+    # Far enough apart that separation never pushes them
+    for i in range(count):
+        angle = 2 * math.pi * i / count
+        pool.spawn(cx + math.cos(angle) * radius, cy + math.sin(angle) * radius, pool.type_names[0])
+
+
+def test_far_enemies_cover_the_same_distance_after_removals(assets):
+    px, py = world_center()
+    camera = Camera()
+    camera.follow(px, py)
+    lod = LODScheduler(camera, random.Random(0))
+
+    full = EnemyPool(assets["enemies"])
+    scheduled = EnemyPool(assets["enemies"])
+    for pool in (full, scheduled):
+        spawn_ring(pool, px, py, 1300, 40)
+    assert not scheduled.inside(camera.rect, app.LOD_MID_MARGIN).any()
+
+    # A multiple of every interval, so each enemy has just caught up
+    ticks = app.LOD_FAR_INTERVAL * 10
+    for tick in range(1, ticks + 1):
+        full.update(px, py)
+        steps, animate = lod.schedule(scheduled, tick)
+        scheduled.update(px, py, None, steps, animate)
+        if tick % 7 == 0:
+            # Kills swap the last slot into the hole, reordering the pool
+            for pool in (full, scheduled):
+                pool.remove(pool.views[tick % len(pool)])
+
+    n = len(full)
+    assert len(scheduled) == n
+    assert np.allclose(scheduled.x[:n], full.x[:n])
+    assert np.allclose(scheduled.y[:n], full.y[:n])
@@ -0,0 +1,45 @@
+# tests/test_snapshot.py
+import pytest
+
+from simulation import Simulation
+from snapshot import HEADER, Snapshot, SnapshotError
+
+
+@pytest.fixture
+def sim(assets):
+    sim = Simulation(assets, seed=1)
+    for _ in range(300):
+        sim.step()
+    return sim
+
+
+def corrupt_state(sim, key, value):
+    snapshot = Snapshot.capture(sim)
+    snapshot.state[key] = value
+    return snapshot.to_bytes()
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda sim: Snapshot.capture(sim).to_bytes()[:HEADER.size - 1],
+    lambda sim: Snapshot.capture(sim).to_bytes()[:HEADER.size] + b"not zlib",
+    lambda sim: Snapshot.capture(sim).to_bytes()[:-8],
+    lambda sim: corrupt_state(sim, "upgrade_options", ["No Such Upgrade"]),
+    lambda sim: corrupt_state(sim, "spawn_queue", [[0, 0, "no such enemy", 0]]),
+    lambda sim: corrupt_state(sim, "groups", [[0, 0]]),
+    lambda sim: corrupt_state(sim, "rng", [3, [1], None]),
+])
+def test_corrupt_snapshots_are_refused_before_restoring(sim, tmp_path, corrupt):
+    path = tmp_path / "corrupt.snap"
+    path.write_bytes(corrupt(sim))
+    tick = sim.tick
+    with pytest.raises(SnapshotError):
+        Snapshot.load(str(path)).restore(sim)
+    assert sim.tick == tick
+
+
+def test_snapshot_round_trip(sim, tmp_path):
+    path = str(tmp_path / "good.snap")
+    Snapshot.capture(sim).save(path)
+    restored = Snapshot.load(path).restore(Simulation(sim.assets))
+    assert restored.tick == sim.tick
+    assert len(restored.enemies) == len(sim.enemies)